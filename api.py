@@ -0,0 +1,431 @@
+# api.py
+"""
+Math Hero — JSON HTTP API (asyncio, no Streamlit, stdlib only)
+Serves the same engine.GameSession the Streamlit app wraps, for mobile / other
+clients. One asyncio event loop handles every connection (HTTP/1.1 keep-alive);
+sessions live in memory and are parked after --ttl seconds of inactivity (a
+small JSON snapshot; the next request resumes it and reloads saved progress),
+parked sessions are dropped after --parked-ttl.
+Answers and finished levels go through the shared EventLog, so saved progress
+and the leaderboard are the same ones the Streamlit app uses.
+
+    python api.py [--host 127.0.0.1] [--port 8502] [--ttl 1800] [--max-sessions 100000] [--parked-ttl 86400]
+
+Endpoints (JSON in, JSON out):
+  POST /sessions                   {"player", "grade", "mode", "class_code", "mcq"} -> session + progress
+  POST /sessions/{id}/level        {"grade", "level", "mode"} -> first question
+  GET  /sessions/{id}/question     current question (no answer)
+  POST /sessions/{id}/answer       {"answer"} -> correctness + next question or level result
+  GET  /sessions/{id}/progress     unlocked levels, level results, score
+  DELETE /sessions/{id}
+  GET  /leaderboard?grade=&level=&n=
+  GET  /health                      session counts and repeated-question re-draw rates per topic
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from dedup import REDRAW_STATS
+from engine import MODES, GameSession
+from question_bank import open_bank
+from eventlog import EVENT_LOG_FILE, EventLog, LeaderboardProjection, ProgressProjection
+from generators import GRADES, LEVELS_PER_GRADE, QUESTIONS_PER_LEVEL
+from grading import parse_answer_input
+from leaderboard import LEADERBOARD_DB, LEADERBOARD_FILE, Leaderboard
+from progress_store import PROGRESS_DB, SAVE_FILE, open_progress_store
+from shapes import render_shape
+
+DECK_SEEDING = os.environ.get("MATH_HERO_DECK_SEEDING", "daily")
+PROGRESS_BACKEND = os.environ.get("MATH_HERO_PROGRESS_BACKEND", "sqlite")
+PROGRESS_DETAIL = os.environ.get("MATH_HERO_PROGRESS_DETAIL", "summary")
+EVENT_FSYNC = os.environ.get("MATH_HERO_EVENT_FSYNC", "interval")
+ADAPTIVE = os.environ.get("MATH_HERO_ADAPTIVE", "").lower() in ("1", "true", "yes", "on")
+QUESTION_BANK = os.environ.get("MATH_HERO_QUESTION_BANK", "")
+SESSION_TTL = 30 * 60  # seconds of inactivity before a session is parked
+MAX_SESSIONS = 100_000  # oldest idle sessions are parked beyond this
+PARKED_TTL = 24 * 60 * 60  # seconds a parked session can still be resumed
+MAX_PARKED = 1_000_000  # oldest parked sessions are dropped beyond this
+MAX_BODY = 64 * 1024
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# ---------------------------
+# Sessions
+# ---------------------------
+class SessionPool:
+    """
+    In-memory GameSessions keyed by session id, kept in last-used order so both
+    TTL eviction and the size cap only ever look at the oldest entries.
+    Evicted sessions are parked as compact JSON (GameSession.park) and resumed
+    on their next request; parked ones expire after parked_ttl.
+    factory(snapshot=None) builds a GameSession, resumed from snapshot if given.
+    """
+
+    def __init__(self, factory, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, clock=time.monotonic,
+                 parked_ttl=PARKED_TTL, max_parked=MAX_PARKED):
+        self.factory = factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.parked_ttl = parked_ttl
+        self.max_parked = max_parked
+        self._sessions = OrderedDict()  # id -> (last_used, game)
+        self._parked = OrderedDict()    # id -> (parked_at, JSON bytes)
+        self.evicted = 0
+        self.resumed = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def parked(self):
+        return len(self._parked)
+
+    def create(self):
+        game = self.factory()
+        sid = game.state['session_id']
+        self._sessions[sid] = (self.clock(), game)
+        while len(self._sessions) > self.max_sessions:
+            self._park(*self._sessions.popitem(last=False))
+        return sid, game
+
+    def _park(self, sid, entry):
+        now = self.clock()
+        self._parked[sid] = (now, json.dumps(entry[1].park(), separators=(",", ":")).encode("utf-8"))
+        self.evicted += 1
+        self._expire_parked(now)
+
+    def _expire_parked(self, now):
+        while self._parked and (len(self._parked) > self.max_parked or next(iter(self._parked.values()))[0] < now - self.parked_ttl):
+            self._parked.popitem(last=False)
+
+    def get(self, sid):
+        entry = self._sessions.get(sid)
+        now = self.clock()
+        if entry is not None and now - entry[0] > self.ttl:
+            del self._sessions[sid]
+            self._park(sid, entry)
+            entry = None
+        if entry is None:
+            parked = self._parked.pop(sid, None)
+            if parked is None or now - parked[0] > self.parked_ttl:
+                return None
+            entry = (now, self.factory(json.loads(parked[1])))
+            self.resumed += 1
+        self._sessions[sid] = (now, entry[1])
+        self._sessions.move_to_end(sid)
+        return entry[1]
+
+    def drop(self, sid):
+        parked = self._parked.pop(sid, None) is not None
+        return self._sessions.pop(sid, None) is not None or parked
+
+    def evict_expired(self):
+        now = self.clock()
+        self._expire_parked(now)
+        cutoff = now - self.ttl
+        n = 0
+        while self._sessions:
+            sid, entry = next(iter(self._sessions.items()))
+            if entry[0] > cutoff:
+                break
+            del self._sessions[sid]
+            self._park(sid, entry)
+            n += 1
+        return n
+
+# ---------------------------
+# Payloads
+# ---------------------------
+def public_question(state):
+    """The current question as sent to clients: everything except the answer."""
+    qdict = state.get('current_q')
+    if not qdict or state['show_result']:
+        return None
+    out = {
+        "q_no": state['question_index'] + 1,
+        "of": QUESTIONS_PER_LEVEL,
+        "type": qdict.get('type'),
+        "topic": qdict.get('topic'),
+        "question": qdict.get('question'),
+        "time_limit": state['time_limit'],
+    }
+    if qdict.get('choices') and (qdict.get('type') == 'shape' or state.get('mcq')):
+        out["choices"] = qdict['choices']
+    if qdict.get('image_key'):
+        out["image_svg"] = render_shape(qdict['image_key'], qdict.get('labels', ()), renderer="svg")
+    return out
+
+def session_payload(sid, game):
+    state = game.state
+    return {
+        "session_id": sid,
+        "player": state['player_name'],
+        "grade": state['grade'],
+        "mode": state['mode'],
+        "mcq": state['mcq'],
+        "level": state['current_level'],
+        "score": state['score'],
+    }
+
+def progress_payload(game, store=None, saved=None):
+    snap = game.progress_snapshot(store, saved)
+    state = game.state
+    return {
+        "player": state['player_name'],
+        "score": state['score'],
+        "weak_topics": state['weak_topics'],
+        "mastery": snap['mastery'],
+        "level_unlocked": snap['level_unlocked'],
+        "level_progress": snap['level_progress'],
+    }
+
+def _int_field(body, name, default=None, allowed=None):
+    value = body.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer")
+    if allowed is not None and value not in allowed:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' out of range")
+    return value
+
+# ---------------------------
+# Application
+# ---------------------------
+class QuizApi:
+    def __init__(self, store, leaderboard, event_log, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, parked_ttl=PARKED_TTL):
+        self.store = store
+        self.leaderboard = leaderboard
+        self.event_log = event_log
+        self.sessions = SessionPool(self._new_game, ttl, max_sessions, parked_ttl=parked_ttl)
+        self.requests = 0
+
+    def _new_game(self, snapshot=None):
+        game = GameSession(emit=self.event_log.emit if self.event_log else None,
+                           deck_seeding=DECK_SEEDING, progress_detail=PROGRESS_DETAIL, adaptive=ADAPTIVE,
+                           bank=open_bank(QUESTION_BANK) if QUESTION_BANK else None)
+        if snapshot is not None:
+            game.resume(snapshot)
+        return game
+
+    def _session(self, sid):
+        game = self.sessions.get(sid)
+        if game is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "unknown or expired session")
+        return sid, game
+
+    async def dispatch(self, method, target, body):
+        self.requests += 1
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if body:
+            try:
+                body = json.loads(body)
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "body must be JSON")
+            if not isinstance(body, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        else:
+            body = {}
+
+        if parts == ["health"] and method == "GET":
+            return {"ok": True, "sessions": len(self.sessions), "parked": self.sessions.parked,
+                    "evicted": self.sessions.evicted, "resumed": self.sessions.resumed,
+                    "redraws": REDRAW_STATS.snapshot()}
+        if parts == ["leaderboard"] and method == "GET":
+            return await self.leaderboard_top(query)
+        if parts == ["sessions"] and method == "POST":
+            return await self.create_session(body)
+        if len(parts) >= 2 and parts[0] == "sessions":
+            sid, game = self._session(parts[1])
+            # a resumed session reloads its saved progress on first use
+            await self._hydrate(game)
+            route = (method, parts[2] if len(parts) == 3 else None)
+            if route == ("DELETE", None):
+                self.sessions.drop(sid)
+                return {"ok": True}
+            if route == ("POST", "level"):
+                return self.start_level(game, body)
+            if route == ("GET", "question"):
+                return {"question": public_question(game.state)}
+            if route == ("POST", "answer"):
+                return self.answer(game, body)
+            if route == ("GET", "progress"):
+                return await self._progress(game)
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+
+    async def create_session(self, body):
+        grade = _int_field(body, 'grade', 5, GRADES)
+        mode = body.get('mode', MODES[0])
+        if mode not in MODES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"'mode' must be one of {list(MODES)}")
+        sid, game = self.sessions.create()
+        state = game.state
+        state['player_name'] = str(body.get('player') or "Player").strip()[:64] or "Player"
+        state['grade'], state['mode'] = grade, mode
+        state['mcq'] = bool(body.get('mcq', False))
+        state['class_code'] = str(body.get('class_code', ''))[:64]
+        await self._hydrate(game)
+        return dict(session_payload(sid, game), progress=await self._progress(game))
+
+    # saved progress is a database read: only the read runs off the event loop, session
+    # state is touched on it, so concurrent requests for one session never interleave with it
+    async def _hydrate(self, game):
+        player = game.state['player_name']
+        if game.state.get('progress_player') != player:
+            game.merge_saved(player, await asyncio.to_thread(self.store.load, player))
+
+    async def _progress(self, game):
+        saved = None
+        if game.state['level_progress_packed']:
+            saved = await asyncio.to_thread(self.store.load, game.state['player_name'])
+        return progress_payload(game, saved=saved)
+
+    def start_level(self, game, body):
+        state = game.state
+        grade = _int_field(body, 'grade', state['grade'], GRADES)
+        level = _int_field(body, 'level', state['current_level'], range(1, LEVELS_PER_GRADE + 1))
+        mode = body.get('mode', state['mode'])
+        if mode not in MODES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"'mode' must be one of {list(MODES)}")
+        if not game.is_unlocked(grade, level):
+            raise ApiError(HTTPStatus.CONFLICT, "level is locked")
+        state['mode'] = mode
+        game.start_level(grade, level)
+        return {"grade": grade, "level": level, "mode": mode, "seed": (state['level_deck'] or {}).get('seed'),
+                "question": public_question(state)}
+
+    def answer(self, game, body):
+        state = game.state
+        if not state['started'] or state['show_result']:
+            raise ApiError(HTTPStatus.CONFLICT, "no question pending; start a level first")
+        if 'answer' not in body:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "'answer' is required")
+        correct_answer = state['current_ans']
+        is_correct = game.record_answer(parse_answer_input(body['answer']))
+        out = {"correct": bool(is_correct), "correct_answer": correct_answer, "score": state['score']}
+        if state['show_result']:
+            out["result"] = state['last_result']
+            out["unlocked"] = sorted(state['level_unlocked'].get(str(state['grade']), {1}))
+        else:
+            out["question"] = public_question(state)
+        return out
+
+    async def leaderboard_top(self, query):
+        grade = _int_field(query, 'grade', None, GRADES) if 'grade' in query else None
+        level = _int_field(query, 'level') if 'level' in query else None
+        n = _int_field(query, 'n', 10, range(1, 101))
+        rows = await asyncio.to_thread(self.leaderboard.top, n, grade, level)
+        return {"grade": grade, "level": level, "rows": rows}
+
+    # ---------------------------
+    # HTTP/1.1 plumbing
+    # ---------------------------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "bad body length"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = HTTPStatus.OK, await self.dispatch(method.upper(), target, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    print("API error:", repr(e))
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def sweep(self, every):
+        while True:
+            await asyncio.sleep(every)
+            self.sessions.evict_expired()
+
+async def serve(api, host="127.0.0.1", port=8502, ready=None):
+    server = await asyncio.start_server(api.handle, host, port)
+    sweeper = asyncio.create_task(api.sweep(max(1.0, min(60.0, api.sessions.ttl / 10))))
+    port = server.sockets[0].getsockname()[1]
+    print(f"Math Hero API on http://{host}:{port}", flush=True)
+    if ready is not None:
+        ready(port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+def build_api(ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, parked_ttl=PARKED_TTL):
+    store = open_progress_store(PROGRESS_BACKEND, SAVE_FILE if PROGRESS_BACKEND == "json" else PROGRESS_DB, legacy_json=SAVE_FILE)
+    leaderboard = Leaderboard(LEADERBOARD_DB, LEADERBOARD_FILE)
+    event_log = EventLog(EVENT_LOG_FILE, fsync=EVENT_FSYNC, handlers=[
+        ProgressProjection(store),
+        LeaderboardProjection(leaderboard),
+    ])
+    return QuizApi(store, leaderboard, event_log, ttl, max_sessions, parked_ttl)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the Math Hero quiz engine as a JSON HTTP API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    ap.add_argument("--ttl", type=float, default=SESSION_TTL, help="idle seconds before a session is parked")
+    ap.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    ap.add_argument("--parked-ttl", type=float, default=PARKED_TTL, help="seconds a parked session can be resumed")
+    args = ap.parse_args(argv)
+    api = build_api(args.ttl, args.max_sessions, args.parked_ttl)
+    try:
+        asyncio.run(serve(api, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.event_log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/api_load.py
+"""
+Math Hero — load test for the JSON HTTP API
+Starts api.py in a temp directory (or targets --url), then runs --clients
+concurrent keep-alive clients. Each client loops: create a session, play
+--levels levels of level 1 (every question answered), read progress and the
+leaderboard. Prints requests/s and latency percentiles as JSON. --adaptive
+starts the server with MATH_HERO_ADAPTIVE=1 (mastery-driven levels, no deck).
+
+    python benchmarks/api_load.py [--clients 50] [--rounds 20] [--levels 1] [--adaptive] [--url http://127.0.0.1:8502]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Client:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+        self.latencies = []
+        self.errors = 0
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        t0 = time.perf_counter()
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length))
+        self.latencies.append(time.perf_counter() - t0)
+        if status != 200:
+            self.errors += 1
+        return data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def run_client(client, rounds, levels, i):
+    for r in range(rounds):
+        s = await client.request("POST", "/sessions", {"player": f"load{i}", "grade": 2 + i % 9})
+        sid = s["session_id"]
+        for _ in range(levels):
+            await client.request("POST", f"/sessions/{sid}/level", {"level": 1})
+            while True:
+                out = await client.request("POST", f"/sessions/{sid}/answer", {"answer": "1"})
+                if "result" in out or "error" in out:
+                    break
+        await client.request("GET", f"/sessions/{sid}/progress")
+        await client.request("GET", f"/leaderboard?grade={2 + i % 9}&n=5")
+        await client.request("DELETE", f"/sessions/{sid}")
+    await client.close()
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+async def load(host, port, clients, rounds, levels):
+    pool = [Client(host, port) for _ in range(clients)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run_client(c, rounds, levels, i) for i, c in enumerate(pool)))
+    elapsed = time.perf_counter() - t0
+    lat = sorted(l for c in pool for l in c.latencies)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "clients": clients, "rounds": rounds, "levels": levels,
+        "requests": len(lat), "errors": sum(c.errors for c in pool),
+        "seconds": round(elapsed, 3), "requests_per_s": round(len(lat) / elapsed, 1),
+        "latency_ms": {"p50": ms(percentile(lat, 50)), "p95": ms(percentile(lat, 95)),
+                       "p99": ms(percentile(lat, 99)), "max": ms(lat[-1] if lat else None)},
+    }
+
+def start_server(adaptive=False):
+    workdir = tempfile.mkdtemp(prefix="mathhero-api-")
+    env = dict(os.environ, MATH_HERO_EVENT_FSYNC="never", PYTHONPATH=ROOT)
+    if adaptive:
+        env["MATH_HERO_ADAPTIVE"] = "1"
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--port", "0"],
+                            cwd=workdir, env=env, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()  # "Math Hero API on http://host:port"
+    if not line:
+        proc.kill()
+        raise SystemExit("api.py did not start")
+    return proc, line.split()[-1]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--rounds", type=int, default=20, help="sessions per client")
+    ap.add_argument("--levels", type=int, default=1, help="levels played per session")
+    ap.add_argument("--adaptive", action="store_true", help="start the server in adaptive mode")
+    ap.add_argument("--url", help="existing server (default: start api.py in a temp dir)")
+    args = ap.parse_args(argv)
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(args.adaptive)
+    try:
+        parts = urlsplit(url)
+        report = asyncio.run(load(parts.hostname, parts.port, args.clients, args.rounds, args.levels))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    print(json.dumps(dict(report, url=url, adaptive=args.adaptive if proc is not None else None), indent=2))
+    return 0 if not report["errors"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# benchmarks/rerun_hydration.py
+"""
+Math Hero — per-rerun cost of progress hydration
+Compares the old module-level merge (list membership, run on every rerun) with
+the once-per-session set merge, on synthetic saved progress.
+
+    python benchmarks/rerun_hydration.py [--reruns 200] [--levels 20]
+"""
+
+import argparse
+import json
+import time
+
+GRADES = range(2, 11)
+
+def synthetic_saved(levels):
+    detail = {"q_no": 1, "question": "12 + 30 = ?", "given": 42, "correct_answer": 42, "is_correct": True, "time_taken": 3.2}
+    return {
+        "level_unlocked": {str(g): list(range(1, levels + 1)) for g in GRADES},
+        "level_progress": {str(g): {str(l): {"total": 10, "correct": 8, "percent": 80, "passed": True, "details": [detail] * 10}
+                                    for l in range(1, levels + 1)} for g in GRADES},
+    }
+
+def legacy_rerun(state, saved_text):
+    # what app.py did on every rerun: parse the snapshot, then merge with list membership
+    saved = json.loads(saved_text)
+    for g, lst in saved.get("level_unlocked", {}).items():
+        state["level_unlocked"].setdefault(str(g), [])
+        for lvl in lst:
+            if lvl not in state["level_unlocked"][str(g)]:
+                state["level_unlocked"][str(g)].append(lvl)
+    for g, obj in saved.get("level_progress", {}).items():
+        state["level_progress"].setdefault(str(g), {})
+        for lvl, data in obj.items():
+            state["level_progress"][str(g)][str(lvl)] = data
+
+def hydrated_rerun(state, saved_text):
+    if state.get("progress_player") == "Player":
+        return
+    state["progress_player"] = "Player"
+    saved = json.loads(saved_text)
+    for g, lst in saved.get("level_unlocked", {}).items():
+        state["level_unlocked"].setdefault(str(g), {1}).update(lst)
+    for g, obj in saved.get("level_progress", {}).items():
+        state["level_progress"].setdefault(str(g), {}).update(obj)
+
+def run(fn, state, saved_text, reruns):
+    t0 = time.perf_counter()
+    for _ in range(reruns):
+        fn(state, saved_text)
+    return (time.perf_counter() - t0) / reruns * 1e6
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--reruns", type=int, default=200)
+    ap.add_argument("--levels", type=int, default=20)
+    args = ap.parse_args(argv)
+    saved_text = json.dumps(synthetic_saved(args.levels))
+    legacy = run(legacy_rerun, {"level_unlocked": {str(g): [1] for g in GRADES}, "level_progress": {}}, saved_text, args.reruns)
+    hydrated = run(hydrated_rerun, {"level_unlocked": {str(g): {1} for g in GRADES}, "level_progress": {}}, saved_text, args.reruns)
+    print(json.dumps({"reruns": args.reruns, "levels_per_grade": args.levels,
+                      "legacy_us_per_rerun": round(legacy, 2), "hydrated_us_per_rerun": round(hydrated, 2)}, indent=2))
+
+if __name__ == "__main__":
+    main()
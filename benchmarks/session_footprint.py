@@ -0,0 +1,86 @@
+# benchmarks/session_footprint.py
+"""
+Math Hero — memory held per hydrated session
+Builds sessions for a player with synthetic saved progress (every grade, all
+levels played), plays a few questions of a level, and reports the bytes each
+session holds: in the legacy shape (sets of unlocked levels, every grade's level
+summaries in full, history as a list of dicts) and as the engine keeps it now
+(bitmask level sets, other grades packed, history a bounded deque of tuples).
+Shared decks are excluded from both; the tracemalloc figure is what the current
+engine allocates per session, shared objects included.
+
+    python benchmarks/session_footprint.py [--sessions 200] [--levels 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameSession
+from footprint import session_bytes
+
+GRADES = range(2, 11)
+
+class MemoryStore:
+    """Just enough of a progress store for GameSession.hydrate; a fresh copy per load, like the real stores."""
+
+    def __init__(self, saved):
+        self.text = json.dumps(saved)
+
+    def load(self, player):
+        return json.loads(self.text)
+
+def synthetic_saved(levels):
+    detail = {"q_no": 1, "question": "12 + 30 = ?", "given": 42, "correct_answer": 42, "is_correct": True, "time_taken": 3.2}
+    return {
+        "level_unlocked": {str(g): list(range(1, levels + 1)) for g in GRADES},
+        "level_progress": {str(g): {str(l): {"total": 10, "correct": 8, "percent": 80, "passed": True, "details": [detail] * 10}
+                                    for l in range(1, levels + 1)} for g in GRADES},
+    }
+
+def play(store, answers=5):
+    game = GameSession(deck_seeding="daily")
+    game.state['player_name'] = "Player"
+    game.hydrate(store)
+    game.start_level(game.state['grade'], 1)
+    for _ in range(answers):
+        game.record_answer(game.state['current_ans'])
+    return game
+
+def legacy_state(game, saved):
+    # the shape a hydrated session had before: nothing packed, sets, history dicts
+    state = dict(game.state)
+    state['level_unlocked'] = {g: set(lvls) for g, lvls in state['level_unlocked'].items()}
+    state['level_progress'] = saved['level_progress']
+    state.pop('level_progress_packed', None)
+    state['recent_history'] = [{"q": q, "given": given, "correct": correct} for q, given, correct in state['recent_history']]
+    return state
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=200)
+    ap.add_argument("--levels", type=int, default=20)
+    args = ap.parse_args(argv)
+    store = MemoryStore(synthetic_saved(args.levels))
+    play(store)  # warm the shared deck cache
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [play(store) for _ in range(args.sessions)]
+    traced = (tracemalloc.get_traced_memory()[0] - before) / args.sessions
+    tracemalloc.stop()
+
+    legacy = sum(session_bytes(legacy_state(g, store.load("Player"))) for g in games) / len(games)
+    current = sum(g.footprint() for g in games) / len(games)
+    parked = sum(len(json.dumps(g.park(), separators=(",", ":"))) for g in games) / len(games)
+    print(json.dumps({"sessions": args.sessions, "levels_per_grade": args.levels,
+                      "legacy_bytes_per_session": round(legacy), "bytes_per_session": round(current),
+                      "reduction": round(1 - current / legacy, 3) if legacy else 0.0,
+                      "traced_bytes_per_session": round(traced), "parked_bytes_per_session": round(parked)}, indent=2))
+
+if __name__ == "__main__":
+    main()
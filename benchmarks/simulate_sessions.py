@@ -0,0 +1,117 @@
+# benchmarks/simulate_sessions.py
+"""
+Math Hero — headless session throughput
+Drives engine.GameSession without Streamlit: each simulated player starts a
+level and answers every question (correctly with --accuracy probability, with a
+wrong answer otherwise), on a fake clock. Events go to an in-memory sink, or to a
+real EventLog in a temp dir with --event-log. Prints sessions/s and answers/s.
+
+With --learners each player instead has a hidden skill per topic that improves
+with practice, and replays each level until it is passed; answers_per_pass then
+compares fixed decks with --adaptive topic selection.
+
+    python benchmarks/simulate_sessions.py [--sessions 2000] [--levels 1] [--accuracy 0.8] [--seeding daily]
+    python benchmarks/simulate_sessions.py --learners --levels 5 [--adaptive]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameSession
+from eventlog import EventLog
+
+class FakeClock:
+    def __init__(self, start=1_700_000_000.0, step=3.0):
+        self.now, self.step = start, step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+MAX_ATTEMPTS = 20  # learners give up on a level after this many tries
+
+class Learner:
+    """Hidden per-topic skill: chance of a correct answer, improving with practice."""
+
+    def __init__(self, rng, accuracy):
+        self.rng = rng
+        self.accuracy = accuracy
+        self.skill = {}
+
+    def answers(self, topic):
+        p = self.skill.setdefault(topic, min(0.97, max(0.2, self.rng.gauss(self.accuracy, 0.2))))
+        self.skill[topic] = p + 0.08 * (1 - p) if self.rng.random() >= p else p + 0.02 * (1 - p)  # misses teach more
+        return self.rng.random() < p
+
+def play_level(game, rng, accuracy, learner=None):
+    state = game.state
+    answers = 0
+    while not state['show_result']:
+        correct = state['current_ans']
+        ok = learner.answers(state['current_q'].get('topic')) if learner else rng.random() < accuracy
+        game.record_answer(correct if ok else "wrong")
+        answers += 1
+    return answers
+
+def simulate(sessions, levels, accuracy, seeding, emit, seed=0, adaptive=False, learners=False):
+    rng = random.Random(seed)
+    clock = FakeClock()
+    answers = passes = 0
+    for i in range(sessions):
+        game = GameSession(emit=emit, deck_seeding=seeding, adaptive=adaptive, clock=clock, rng=rng)
+        game.state['player_name'] = f"sim{i}"
+        grade = 2 + i % 9
+        learner = Learner(rng, accuracy) if learners else None
+        for lvl in range(1, levels + 1):
+            game.unlock(grade, lvl)
+            for _ in range(MAX_ATTEMPTS if learners else 1):
+                game.start_level(grade, lvl)
+                answers += play_level(game, rng, accuracy, learner)
+                if game.state['last_result']['passed']:
+                    passes += 1
+                    break
+    return answers, passes
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=2000)
+    ap.add_argument("--levels", type=int, default=1, help="levels played per session")
+    ap.add_argument("--accuracy", type=float, default=0.8)
+    ap.add_argument("--seeding", choices=["daily", "fixed", "off"], default="daily")
+    ap.add_argument("--event-log", action="store_true", help="emit into a real EventLog (temp dir, fsync=never)")
+    ap.add_argument("--adaptive", action="store_true", help="mastery-driven topic selection (engine adaptive mode)")
+    ap.add_argument("--learners", action="store_true", help="players with per-topic skill who replay levels until passed")
+    args = ap.parse_args(argv)
+
+    log = None
+    if args.event_log:
+        log = EventLog(os.path.join(tempfile.mkdtemp(prefix="mathhero-sim-"), "events.jsonl"), fsync="never")
+        emit = log.emit
+    else:
+        events = []
+        emit = events.append
+
+    t0 = time.perf_counter()
+    answers, passes = simulate(args.sessions, args.levels, args.accuracy, args.seeding, emit, adaptive=args.adaptive,
+                               learners=args.learners)
+    if log is not None:
+        log.close()
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "sessions": args.sessions, "levels_per_session": args.levels, "adaptive": args.adaptive,
+        "answers": answers, "passes": passes,
+        "answers_per_pass": round(answers / passes, 2) if passes else None,
+        "seconds": round(elapsed, 3),
+        "sessions_per_s": round(args.sessions / elapsed, 1),
+        "answers_per_s": round(answers / elapsed, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/startup_importtime.py
+"""
+Math Hero — cold-start import benchmark
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for each
+module the app loads at startup (app.py's module-level imports, standard library
+left out) and reports cumulative import time plus the
+heaviest imports, as JSON (best of --runs).
+
+    python benchmarks/startup_importtime.py [--runs 5] [--top 15] [--out startup.json] [module ...]
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def app_imports(path=os.path.join(ROOT, "app.py")):
+    """Top-level modules app.py imports before the first widget is drawn, in order (no stdlib)."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    names = []
+    for node in tree.body:  # module level only: imports inside functions load lazily
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    tops = [n.split(".")[0] for n in names]
+    return [m for m in dict.fromkeys(tops) if m not in sys.stdlib_module_names]
+
+def parse_importtime(stderr):
+    """Yield (module, self_us, cumulative_us) from -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            yield name.strip(), int(self_us), int(cum_us)
+        except ValueError:
+            continue
+
+def measure(module, runs):
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+        entries = list(parse_importtime(proc.stderr))
+        total = sum(self_us for _, self_us, _ in entries)
+        if best is None or total < best["total_us"]:
+            best = {"module": module, "total_us": total, "modules_loaded": len(entries), "entries": entries}
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("modules", nargs="*", help="modules to import (default: app.py's)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    report = {"python": sys.version.split()[0], "runs": args.runs, "results": []}
+    for module in args.modules or app_imports():
+        res = measure(module, args.runs)
+        if "entries" in res:
+            heaviest = sorted(res.pop("entries"), key=lambda e: e[2], reverse=True)[:args.top]
+            res["heaviest"] = [{"module": m, "self_us": s, "cumulative_us": c} for m, s, c in heaviest]
+        report["results"].append(res)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/stress_concurrent_writes.py
+"""
+Math Hero — multi-process write stress check
+Several worker processes hammer the shared files the way multiple Streamlit
+workers do: JsonProgressStore.save_level (read-modify-write of one JSON file),
+append_leaderboard (CSV appends) and EventLog (JSONL appends), while reader
+processes keep calling load_json. Afterwards it verifies that nothing was lost:
+every level and unlock is in the JSON, every CSV row is there under exactly one
+header, every event line parses, and no reader ever saw an empty snapshot.
+Exits non-zero on any loss.
+
+    python benchmarks/stress_concurrent_writes.py [--workers 8] [--levels 40] [--readers 2]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eventlog import EventLog, iter_events
+from leaderboard import LEADERBOARD_FIELDS, append_leaderboard
+from progress_store import JsonProgressStore, load_json
+
+ROWS_PER_LEVEL = 10
+
+def writer(worker, levels, workdir):
+    store = JsonProgressStore(os.path.join(workdir, "progress.json"))
+    log = EventLog(os.path.join(workdir, "events.jsonl"), fsync="never", batch_size=16)
+    player = f"p{worker}"
+    for lvl in range(1, levels + 1):
+        grade = 2 + worker % 9
+        level = worker * 1000 + lvl  # unique per worker so every write must survive
+        store.save_level(player, grade, level, {"percent": lvl, "worker": worker}, unlock=level + 1)
+        rows = [{
+            "timestamp": time.time(), "player": player, "grade": grade, "level": level, "q_no": q,
+            "question": f"{worker}-{lvl}-{q}, with \"quotes\"\nand a newline", "given": q, "correct_answer": q,
+            "is_correct": 1, "time_taken": 1.0, "percent_level": 100,
+        } for q in range(1, ROWS_PER_LEVEL + 1)]
+        append_leaderboard(rows, os.path.join(workdir, "leaderboard.csv"))
+        for r in rows:
+            log.emit({"type": "answer", "worker": worker, "level": level, "q_no": r["q_no"]})
+    log.close()
+
+def reader(stop, workdir, result):
+    path = os.path.join(workdir, "progress.json")
+    reads = empty = 0
+    while not stop.is_set():
+        if os.path.exists(path) or os.path.exists(path + ".bak"):
+            reads += 1
+            if not load_json(path):
+                empty += 1
+    result.put((reads, empty))
+
+def verify(workdir, workers, levels, reader_results):
+    problems = []
+    data = load_json(os.path.join(workdir, "progress.json"))
+    for w in range(workers):
+        grade = str(2 + w % 9)
+        for lvl in range(1, levels + 1):
+            level = w * 1000 + lvl
+            if str(level) not in data.get("level_progress", {}).get(grade, {}):
+                problems.append(f"missing progress grade {grade} level {level}")
+            if level + 1 not in data.get("level_unlocked", {}).get(grade, []):
+                problems.append(f"missing unlock grade {grade} level {level + 1}")
+
+    with open(os.path.join(workdir, "leaderboard.csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    headers = sum(1 for r in rows if r == LEADERBOARD_FIELDS)
+    if headers != 1 or rows[0] != LEADERBOARD_FIELDS:
+        problems.append(f"expected exactly one header line first, found {headers}")
+    data_rows = [r for r in rows if r != LEADERBOARD_FIELDS]
+    expected = workers * levels * ROWS_PER_LEVEL
+    if len(data_rows) != expected or any(len(r) != len(LEADERBOARD_FIELDS) for r in data_rows):
+        problems.append(f"leaderboard rows: expected {expected} well-formed, got {len(data_rows)}")
+
+    events = list(iter_events(os.path.join(workdir, "events.jsonl")))
+    if len(events) != expected:
+        problems.append(f"events: expected {expected}, got {len(events)}")
+
+    empty_reads = sum(e for _, e in reader_results)
+    if empty_reads:
+        problems.append(f"readers saw an empty/unreadable snapshot {empty_reads} times")
+    return problems
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--levels", type=int, default=40)
+    ap.add_argument("--readers", type=int, default=2)
+    args = ap.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="mathhero-stress-")
+    stop, results = mp.Event(), mp.Queue()
+    readers = [mp.Process(target=reader, args=(stop, workdir, results)) for _ in range(args.readers)]
+    writers = [mp.Process(target=writer, args=(w, args.levels, workdir)) for w in range(args.workers)]
+    t0 = time.perf_counter()
+    for p in readers + writers:
+        p.start()
+    for p in writers:
+        p.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    reader_results = [results.get() for _ in readers]
+    for p in readers:
+        p.join()
+
+    problems = verify(workdir, args.workers, args.levels, reader_results)
+    print(json.dumps({
+        "workdir": workdir, "workers": args.workers, "levels_per_worker": args.levels,
+        "seconds": round(elapsed, 2), "snapshot_reads": sum(r for r, _ in reader_results),
+        "ok": not problems, "problems": problems[:20],
+    }, indent=2))
+    return 0 if not problems else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
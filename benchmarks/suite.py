@@ -0,0 +1,279 @@
+# benchmarks/suite.py
+"""
+Math Hero — benchmark suite
+Micro / macro benchmarks for the hot paths, emitted as one JSON document so runs
+can be stored per commit and compared:
+- generators: every registered gen_* per supported grade, generate_question_for_grade per grade
+- shapes: gen_shape_question alone, plus uncached SVG / PNG drawing (PNG needs Pillow)
+- grading: grade_answer per answer kind, GameSession.record_answer over a whole level
+- progress: save_json / load_json as the snapshot grows (and the SQLite store for comparison)
+- leaderboard: append_leaderboard into a file of N rows, full-file reads of it
+- bank: building / opening a question bank file, question by index, level decks
+  from the bank next to generated ones
+
+    python benchmarks/suite.py [--only generators grading] [--rows 10000 1000000] [--levels 100 1000 5000]
+                               [--min-time 0.2] [--out bench.json] [--compare previous.json] [--threshold 0.2]
+
+With --compare, results more than --threshold slower than the baseline are listed
+under "regressions" and the exit code is 1.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine import GameSession
+from generators import (GRADES, QUESTIONS_PER_LEVEL, gen_shape_question, generate_level, generate_question_for_grade,
+                        get_generator, topics_for_grade)
+from grading import answer_kind, grade_answer
+from leaderboard import LEADERBOARD_FIELDS, append_leaderboard, iter_leaderboard_csv
+from progress_store import SqliteProgressStore, load_json, save_json
+from question_bank import QuestionBank, build_bank
+from shapes import render_shape_png, render_shape_svg
+
+GROUPS = ("generators", "shapes", "grading", "progress", "leaderboard", "bank")
+
+# one (given, correct) pair per answer kind grading.answer_kind distinguishes
+GRADING_CASES = [
+    ("42", 42),
+    ("6/8", {"fraction": "3/4", "decimal": 0.75}),
+    ("2 1/3", "2 1/3"),
+    ("3:45", "3:45"),
+    ("[[1, 2], [3, 4]]", "[[1,2],[3,4]]"),
+    ("yes", "Yes"),
+    ("<", "<"),
+]
+
+def bench(fn, min_time=0.2, repeat=3):
+    """Best-of-`repeat` timing; each repeat calls fn until min_time has passed."""
+    best = None
+    for _ in range(repeat):
+        n, t0 = 0, time.perf_counter()
+        while True:
+            fn()
+            n += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        per_op = elapsed / n
+        best = per_op if best is None else min(best, per_op)
+    return {"us_per_op": round(best * 1e6, 3), "ops_per_s": round(1 / best, 1)}
+
+def once(fn):
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    return {"us_per_op": round(elapsed * 1e6, 3), "ops_per_s": round(1 / elapsed, 1) if elapsed else None}
+
+def result(group, name, timing, **params):
+    return dict({"group": group, "name": name, "params": params}, **timing)
+
+# ---------------------------
+# Groups
+# ---------------------------
+def bench_generators(args):
+    rng = random.Random(0)
+    out = []
+    for grade in GRADES:
+        for topic in topics_for_grade(grade):
+            func = get_generator(topic).func
+            out.append(result("generators", f"gen:{topic}", bench(lambda: func(grade, rng), args.min_time), grade=grade))
+        out.append(result("generators", "generate_question_for_grade",
+                          bench(lambda: generate_question_for_grade(grade, rng), args.min_time), grade=grade))
+    return out
+
+def bench_shapes(args):
+    rng = random.Random(0)
+    out = []
+    draw_svg = render_shape_svg.__wrapped__  # bypass the lru_cache: measure drawing itself
+    draw_png = render_shape_png.__wrapped__
+    try:
+        import PIL  # noqa: F401
+        have_pil = True
+    except ImportError:
+        have_pil = False
+    for grade in GRADES:
+        out.append(result("shapes", "gen_shape_question", bench(lambda: gen_shape_question(grade, rng), args.min_time), grade=grade))
+
+        def with_svg():
+            q = gen_shape_question(grade, rng)
+            draw_svg(q["image_key"], q["labels"])
+        out.append(result("shapes", "gen_shape_question+svg", bench(with_svg, args.min_time), grade=grade))
+        if have_pil:
+            def with_png():
+                q = gen_shape_question(grade, rng)
+                draw_png(q["image_key"])
+            out.append(result("shapes", "gen_shape_question+png", bench(with_png, args.min_time), grade=grade))
+    return out
+
+def bench_grading(args):
+    out = []
+    for given, correct in GRADING_CASES:
+        out.append(result("grading", f"grade_answer:{answer_kind(correct)}",
+                          bench(lambda: grade_answer(given, correct), args.min_time)))
+    rng = random.Random(0)
+    for mode in ("Math Quiz", "Shape Challenge"):
+        def play_level():
+            game = GameSession(deck_seeding="fixed", rng=rng)
+            game.state['mode'] = mode
+            game.start_level(game.state['grade'], 1)
+            while not game.state['show_result']:
+                game.record_answer(str(game.state['current_ans']))
+        out.append(result("grading", "record_answer:level", bench(play_level, args.min_time),
+                          mode=mode, answers=QUESTIONS_PER_LEVEL))
+    return out
+
+def synthetic_progress(levels):
+    per_grade = max(1, levels // len(GRADES))
+    summary = {"total": 10, "correct": 8, "percent": 80, "passed": True, "seed": 123456789,
+               "avg_time": 4.2, "played_at": 1_700_000_000.0}
+    return {
+        "level_unlocked": {str(g): list(range(1, per_grade + 2)) for g in GRADES},
+        "level_progress": {str(g): {str(l): dict(summary) for l in range(1, per_grade + 1)} for g in GRADES},
+    }
+
+def bench_progress(args, workdir):
+    out = []
+    for levels in args.levels:
+        data = synthetic_progress(levels)
+        path = os.path.join(workdir, f"progress_{levels}.json")
+        out.append(result("progress", "save_json", bench(lambda: save_json(data, path), args.min_time), levels=levels))
+        out.append(result("progress", "load_json", bench(lambda: load_json(path), args.min_time), levels=levels,
+                          bytes=os.path.getsize(path)))
+        store = SqliteProgressStore(os.path.join(workdir, f"progress_{levels}.db"))
+        store.save("bench", data)
+        out.append(result("progress", "sqlite:save_level",
+                          bench(lambda: store.save_level("bench", 5, 1, data["level_progress"]["5"]["1"], unlock=2), args.min_time),
+                          levels=levels))
+        out.append(result("progress", "sqlite:load", bench(lambda: store.load("bench"), args.min_time), levels=levels))
+        store.close()
+    return out
+
+def _leaderboard_rows(n, start=0):
+    for i in range(start, start + n):
+        yield {"timestamp": 1_700_000_000 + i, "player": f"p{i % 500}", "grade": 2 + i % 9, "level": 1 + i % 20,
+               "q_no": 1 + i % 10, "question": f"{i} + 7 = ?", "given": i + 7, "correct_answer": i + 7,
+               "is_correct": 1, "time_taken": 3.5, "percent_level": 80}
+
+def bench_leaderboard(args, workdir):
+    out = []
+    for rows in args.rows:
+        path = os.path.join(workdir, f"leaderboard_{rows}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS)
+            writer.writeheader()
+            writer.writerows(_leaderboard_rows(rows))
+        level_rows = list(_leaderboard_rows(QUESTIONS_PER_LEVEL, rows))
+        out.append(result("leaderboard", "append_leaderboard", bench(lambda: append_leaderboard(level_rows, path), args.min_time),
+                          rows=rows, batch=len(level_rows)))
+
+        def read_all():
+            with open(path, newline="", encoding="utf-8") as f:
+                for _ in csv.DictReader(f):
+                    pass
+        out.append(result("leaderboard", "read:csv.DictReader", once(read_all) if rows >= 1_000_000 else bench(read_all, args.min_time),
+                          rows=rows, bytes=os.path.getsize(path)))
+
+        def export_all():
+            for _ in iter_leaderboard_csv(path):
+                pass
+        out.append(result("leaderboard", "read:iter_leaderboard_csv", once(export_all) if rows >= 1_000_000 else bench(export_all, args.min_time),
+                          rows=rows))
+    return out
+
+def bench_bank(args, workdir):
+    path = os.path.join(workdir, "bank.mhqb")
+    rng = random.Random(0)
+    out = [result("bank", "build", once(lambda: build_bank(path, n=200, seed=0)))]
+    out.append(result("bank", "open", bench(lambda: QuestionBank(path).close(), args.min_time), bytes=os.path.getsize(path)))
+    bank = QuestionBank(path)
+    for grade, topic in ((4, "decimals"), (9, "sets"), (5, "shapes")):
+        n = bank.count(grade, topic)
+        out.append(result("bank", f"question:{topic}", bench(lambda: bank.question(grade, topic, rng.randrange(n)), args.min_time),
+                          grade=grade))
+    for mode in ("Math Quiz", "Shape Challenge"):
+        out.append(result("bank", f"deck:{mode}", bench(lambda: bank.deck(5, 1, mode, QUESTIONS_PER_LEVEL, rng), args.min_time)))
+        out.append(result("bank", f"generate_level:{mode}", bench(lambda: generate_level(5, 1, mode), args.min_time)))
+    bank.close()
+    return out
+
+# ---------------------------
+# Reporting
+# ---------------------------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _key(r):
+    return (r["group"], r["name"], json.dumps(r["params"], sort_keys=True))
+
+def compare(results, baseline, threshold):
+    """Results whose time per op grew by more than `threshold` (0.2 = 20%) against the baseline."""
+    before = {_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = before.get(_key(r))
+        if old and old["us_per_op"] and r["us_per_op"] > old["us_per_op"] * (1 + threshold):
+            regressions.append({"group": r["group"], "name": r["name"], "params": r["params"],
+                                "before_us": old["us_per_op"], "after_us": r["us_per_op"],
+                                "slowdown": round(r["us_per_op"] / old["us_per_op"], 2)})
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000], help="leaderboard sizes (e.g. 10000 1000000)")
+    ap.add_argument("--levels", type=int, nargs="+", default=[100, 1000, 5000], help="saved levels in the progress snapshot")
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    ap.add_argument("--out", help="write the JSON report here (default stdout)")
+    ap.add_argument("--compare", help="baseline JSON report from an earlier run")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="mathhero-bench-")
+    runners = {
+        "generators": lambda: bench_generators(args),
+        "shapes": lambda: bench_shapes(args),
+        "grading": lambda: bench_grading(args),
+        "progress": lambda: bench_progress(args, workdir),
+        "leaderboard": lambda: bench_leaderboard(args, workdir),
+        "bank": lambda: bench_bank(args, workdir),
+    }
+    results = []
+    for group in GROUPS:
+        if group in args.only:
+            print(f"running {group} ...", file=sys.stderr)
+            results.extend(runners[group]())
+
+    report = {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "min_time": args.min_time},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.threshold)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Wrote {len(results)} results to {os.path.abspath(args.out)}", file=sys.stderr)
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
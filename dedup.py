@@ -0,0 +1,125 @@
+# dedup.py
+"""
+Math Hero — repeated-question avoidance
+- fingerprint: 64-bit hash of a question's canonical text (case / spacing folded,
+  "a + b" and "b + a" treated as the same question)
+- QuestionIndex: bounded rolling window of recent fingerprints with O(1) lookup
+  and eviction; one per level deck (no repeats inside a level) and one per
+  session (no repeats across the last few levels)
+- draw_unique: call a draw function until it yields a question not in the index,
+  giving up after MAX_REDRAWS (tiny topics, e.g. three trig questions, run out)
+- REDRAW_STATS: process-wide draws / re-draws / give-ups per topic
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import deque
+
+MAX_REDRAWS = 8
+# levels of earlier questions a session avoids repeating (besides the current level)
+LOOKBACK_LEVELS = int(os.environ.get("MATH_HERO_DEDUP_LOOKBACK", "2"))
+
+_COMMUTATIVE_RE = re.compile(r"^(\d+) ([+×]) (\d+) = \?$")
+
+def fingerprint(question):
+    text = " ".join(str(question).lower().split())
+    m = _COMMUTATIVE_RE.match(text)
+    if m:
+        a, op, b = int(m.group(1)), m.group(2), int(m.group(3))
+        text = f"{min(a, b)} {op} {max(a, b)} = ?"
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+class QuestionIndex:
+    """The last `capacity` fingerprints, oldest evicted first."""
+
+    __slots__ = ("capacity", "_order", "_counts")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._order = deque()
+        self._counts = {}  # fingerprint -> occurrences inside the window
+
+    def __contains__(self, fp):
+        return fp in self._counts
+
+    def __len__(self):
+        return len(self._order)
+
+    def add(self, fp):
+        self._order.append(fp)
+        self._counts[fp] = self._counts.get(fp, 0) + 1
+        if len(self._order) > self.capacity:
+            old = self._order.popleft()
+            left = self._counts[old] - 1
+            if left:
+                self._counts[old] = left
+            else:
+                del self._counts[old]
+
+    def clear(self):
+        self._order.clear()
+        self._counts.clear()
+
+class RedrawStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}  # topic -> [draws, redraws, exhausted]
+
+    def record(self, topic, duplicate, exhausted=False):
+        with self._lock:
+            row = self._rows.get(topic)
+            if row is None:
+                row = self._rows[topic] = [0, 0, 0]
+            row[0] += 1
+            row[1] += duplicate
+            row[2] += exhausted
+
+    def snapshot(self):
+        """{topic: {draws, redraws, exhausted, redraw_rate}}"""
+        with self._lock:
+            rows = {t: tuple(r) for t, r in self._rows.items()}
+        return {t: {"draws": d, "redraws": r, "exhausted": x, "redraw_rate": round(r / d, 4) if d else 0.0}
+                for t, (d, r, x) in sorted(rows.items())}
+
+    def reset(self):
+        with self._lock:
+            self._rows.clear()
+
+    def prometheus_lines(self):
+        snap = self.snapshot()
+        lines = []
+        for name, field, help_text in (
+            ("math_hero_question_draws_total", "draws", "Questions drawn per topic (including re-draws)."),
+            ("math_hero_question_redraws_total", "redraws", "Draws rejected as recent repeats per topic."),
+            ("math_hero_question_repeats_total", "exhausted", "Repeats accepted after MAX_REDRAWS per topic."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{topic="{t}"}} {row[field]}' for t, row in snap.items()]
+        return lines
+
+REDRAW_STATS = RedrawStats()
+
+def _topic(qdict):
+    return qdict.get('topic') or qdict.get('type') or "unknown"
+
+def draw_unique(draw, index, max_redraws=MAX_REDRAWS, first=None):
+    """
+    Question dict from draw() whose fingerprint is not in index (then added to it).
+    first: an already drawn question to try before calling draw().
+    After max_redraws rejected draws the last one is kept even if repeated.
+    """
+    qdict = first if first is not None else draw()
+    for attempt in range(max_redraws + 1):
+        fp = fingerprint(qdict['question'])
+        if fp not in index:
+            REDRAW_STATS.record(_topic(qdict), False)
+            break
+        if attempt == max_redraws:
+            REDRAW_STATS.record(_topic(qdict), True, exhausted=True)
+            break
+        REDRAW_STATS.record(_topic(qdict), True)
+        qdict = draw()
+    index.add(fp)
+    return qdict
@@ -0,0 +1,175 @@
+# distractors.py
+"""
+Math Hero — multiple-choice distractors
+make_choices() turns a correct answer plus a few common-mistake candidates into
+CHOICES distinct options. Wrong options are taken, in order, from:
+1. the mistake models the caller passes (e.g. perimeter instead of area,
+   diameter used as radius, forgetting the ½ in a triangle's area)
+2. generic slips for the answer's kind (off by one / by ten, digits swapped,
+   reciprocal fraction, hour vs minute slips, one matrix entry off ...)
+3. evenly spaced near misses, which can never collide
+Every candidate that grades as correct (grading.grade_answer, so "6/8" for 3/4
+or a value inside the tolerance), repeats an earlier option, or has the wrong
+sign is dropped. No random re-rolls: the options are a pure function of the
+answer and the mistakes, and the correct answer's slot comes from a hash of the
+question text, so the same question always shows the same choices and the
+caller's rng is not consumed. The candidate list is bounded, so cost is O(1).
+"""
+
+import re
+import zlib
+from fractions import Fraction
+
+from grading import _MIXED_RE, TOLERANCE, answer_kind, coerce_correct, grade_answer, parse_number, parse_time
+
+CHOICES = 4
+FIXED_CHOICES = {
+    "comparison": (">", "<", "="),
+    "yesno": ("yes", "no"),
+}
+
+def choice_value(answer):
+    """What an option shows for an answer (fraction answers show the fraction)."""
+    answer = coerce_correct(answer)
+    if isinstance(answer, dict):
+        return answer.get("fraction")
+    return answer
+
+def _decimals(x):
+    if isinstance(x, int):
+        return 0
+    s = repr(float(x))
+    return min(3, len(s.split(".")[1].rstrip("0"))) if "." in s and "e" not in s else 3
+
+def _number_slips(x):
+    """Generic numeric slips, most plausible first, then near misses that always differ."""
+    d = _decimals(x)
+    unit = 10 ** -d
+    step = max(unit, round(abs(x) * 0.1, d))
+    # options keep the answer's type: 35.0 gets 70.0, not 70
+    fmt = (lambda v: int(round(v))) if isinstance(x, int) else (lambda v: float(round(v, d)))
+    cands = [x + step, x - step, x + 1, x - 1, x + 10, x - 10]
+    if d == 0 and 10 <= abs(x) < 100 and x % 10:
+        cands.insert(0, int(str(int(abs(x)))[::-1]) * (1 if x > 0 else -1))  # digits swapped
+    if d:
+        cands.insert(0, x * 10)  # decimal point slipped
+    sign = -1 if x < 0 else 1
+    cands += [x + sign * step * k for k in range(2, CHOICES + 2)]
+    return [fmt(c) for c in cands]
+
+def _fraction_slips(value):
+    f = parse_number(value)
+    if f is None:
+        return []
+    n, d = f.numerator, f.denominator
+    out = []
+    if n:
+        out.append(f"{d}/{n}")  # reciprocal
+    out += [f"{n + 1}/{d}", f"{n}/{d + 1}", f"{max(n - 1, 1)}/{d}", f"{n + d}/{d * 2}"]
+    out += [f"{n + k}/{d}" for k in range(2, CHOICES + 2)]
+    return out
+
+def _mixed_slips(value):
+    m = _MIXED_RE.match(str(value).strip())
+    if not m:
+        return _number_slips(int(value)) if re.match(r"^[+-]?\d+$", str(value).strip()) else []
+    whole, num, den = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    out = [f"{whole + 1} {num}/{den}", f"{whole} {den - num}/{den}" if den - num else None,
+           f"{max(whole - 1, 0)} {num}/{den}", f"{whole} {num}/{den + 1}"]
+    out += [f"{whole + k} {num}/{den}" for k in range(2, CHOICES + 2)]
+    return [o for o in out if o]
+
+def _time_slips(value):
+    total = parse_time(value)
+    if total is None:
+        return []
+    h, m = divmod(total, 60)
+    fmt = lambda t: f"{t // 60}:{t % 60:02d}"
+    out = [fmt(total + 15), fmt(total + 60), f"{m}:{h:02d}" if m < 60 and h < 60 else None]
+    if total >= 15:
+        out.append(fmt(total - 15))
+    out += [fmt(total + 15 * k) for k in range(2, CHOICES + 3)]
+    return [o for o in out if o]
+
+def _matrix_slips(value):
+    nums = [int(x) for x in re.findall(r"-?\d+", str(value))]
+    if len(nums) != 4:
+        return []
+    fmt = lambda v: f"[[{v[0]},{v[1]}],[{v[2]},{v[3]}]]"
+    out = []
+    for i, delta in ((0, 1), (3, -1), (1, 1), (2, 1), (0, 2), (3, 1), (1, 2)):
+        v = list(nums)
+        v[i] += delta
+        out.append(fmt(v))
+    return out
+
+def _kind_slips(answer, kind):
+    if kind == "fraction":
+        return _fraction_slips(answer.get("fraction"))
+    if kind == "number":
+        if isinstance(answer, (int, float)):
+            return _number_slips(answer)
+        x = parse_number(answer)
+        if x is None:
+            return []
+        return _number_slips(int(x) if x.denominator == 1 else float(x))
+    if kind == "mixed":
+        return _mixed_slips(answer)
+    if kind == "time":
+        return _time_slips(answer)
+    if kind == "matrix":
+        return _matrix_slips(answer)
+    return []
+
+def _plausible(x, a):
+    # keep the sign of the answer: no negative lengths, counts or prices
+    if x is None or a is None:
+        return True
+    return x < 0 if a < 0 else x >= 0
+
+def _is_correct(cand, x, answer, kind, a):
+    if kind == "number" and x is not None and a is not None:
+        return abs(float(x) - float(a)) <= TOLERANCE  # same test as grade_answer, parsed once
+    return grade_answer(cand, answer)
+
+def _candidates(mistakes, answer, kind):
+    yield from mistakes
+    yield from _kind_slips(answer, kind)  # only built when the mistakes run out
+
+def answer_slot(key, n=CHOICES):
+    """Deterministic position of the correct answer (crc32 of e.g. the question text)."""
+    return zlib.crc32(str(key).encode("utf-8")) % n
+
+def make_choices(answer, mistakes=(), key="", n=CHOICES):
+    """
+    Options for an MCQ: the correct answer (as choice_value shows it) plus up to
+    n-1 distinct wrong answers, or None when the answer kind has no sensible
+    distractors (free text).
+    """
+    answer = coerce_correct(answer)
+    plain = isinstance(answer, (int, float)) and not isinstance(answer, bool)
+    kind = "number" if plain else answer_kind(answer)
+    shown = choice_value(answer)
+    fixed = FIXED_CHOICES.get("comparison" if shown in FIXED_CHOICES["comparison"] else kind)
+    if fixed is not None:
+        wrong = [c for c in fixed if not grade_answer(c, answer)]
+    else:
+        a = answer if plain else parse_number(shown)
+        wrong, seen = [], {str(shown)}
+        for cand in _candidates(mistakes, answer, kind):
+            if len(wrong) == n - 1:
+                break
+            if isinstance(cand, Fraction):
+                cand = float(cand)
+            if str(cand) in seen:
+                continue
+            x = cand if isinstance(cand, (int, float)) else parse_number(cand)
+            if not _plausible(x, a) or _is_correct(cand, x, answer, kind, a):
+                continue
+            seen.add(str(cand))
+            wrong.append(cand)
+        if not wrong:
+            return None
+    wrong = wrong[:n - 1]
+    slot = answer_slot(key, len(wrong) + 1)
+    return wrong[:slot] + [shown] + wrong[slot:]
@@ -0,0 +1,433 @@
+# engine.py
+"""
+Math Hero — game engine (no Streamlit)
+GameSession owns the game rules: starting a level, serving questions from the
+level deck, grading answers, scoring, unlocking and emitting answer/level events.
+Its state lives in any mutable mapping with the same keys as the app's session
+defaults; the Streamlit UI passes st.session_state, simulations / other
+frontends pass a plain dict.
+
+The state is kept small (footprint.session_bytes): questions are references
+into the shared level deck, the answer history is a short ring buffer, unlocked
+levels are bitmasks and grades other than the current one keep one byte per
+level (full results stay in the progress store). The API's session pool
+park()s idle sessions into a small JSON snapshot and resume()s them later.
+
+    game = GameSession()
+    game.start_level(5, 1)
+    while not game.state['show_result']:
+        game.record_answer(game.state['current_ans'])
+"""
+
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from dedup import LOOKBACK_LEVELS, QuestionIndex, draw_unique, fingerprint
+from generators import GRADES, LEVELS_PER_GRADE, QUESTIONS_PER_LEVEL, generate_question_for_grade, gen_shape_question, generate_level, level_seed
+from grading import grade_answer
+from mastery import Mastery, choose_adaptive_topic, grade_mastered
+from footprint import session_bytes
+from results import LevelResult, LevelSet, pack_progress, unpack_progress
+
+PASS_PERCENT = 70  # percent needed to pass a level
+MODES = ("Math Quiz", "Shape Challenge")
+ADAPTIVE_MIN_QUESTIONS = 5  # adaptive levels can end early after this many, all correct, once the grade is mastered
+HISTORY_SIZE = 5  # recent answers kept for the "Recent History" list
+# what park() keeps: everything else is reloaded from the progress store or rebuilt
+PARK_KEYS = ("player_name", "session_id", "grade", "mode", "mcq", "current_level", "time_limit", "score",
+             "weak_topics", "class_code")
+
+def default_state():
+    """Fresh session defaults (new containers on every call)."""
+    return {
+        "player_name": "Player",
+        "session_id": uuid.uuid4().hex,
+        "grade": 5,
+        "mode": "Math Quiz",  # "Math Quiz" or "Shape Challenge"
+        "mcq": False,  # Math Quiz as multiple choice (Shape Challenge always is)
+        "current_level": 1,
+        "level_unlocked": {str(g): LevelSet((1,)) for g in GRADES},  # unlocked levels per grade (strings)
+        "level_progress": {},  # level summaries per grade->level (grades played or loaded, until packed)
+        "level_progress_packed": {},  # grade -> results.pack_progress bytes for grades the player isn't on
+        "started": False,
+        "question_index": 0,
+        "correct_in_level": 0,
+        "current_q": None,
+        "current_ans": None,
+        "current_choices": None,
+        "question_start_time": None,
+        "time_limit": 45,
+        "score": 0,
+        "recent_history": deque(maxlen=HISTORY_SIZE),  # (question, given, correct)
+        "weak_topics": {},
+        "mastery": {},  # topic -> [rating, answers] (see mastery.py)
+        "show_result": False,
+        "last_result": None,
+        "ui_input": "",
+        "shape_key": None,
+        "auto_clear": False,
+        "level_results": None,  # LevelResult for current level
+        "attempt": None,  # id of the current level attempt (groups its events)
+        "progress_player": None,  # player whose saved progress has been merged in
+        "level_deck": None,  # pre-generated questions for current level
+        "class_code": "",  # salt for shared, reproducible level decks
+        "seen_questions": None,  # dedup.QuestionIndex of recently served questions (created on first use)
+        "seen_decks": None,  # (grade, level, mode, seed) of the seeded decks those questions came from
+    }
+
+class GameSession:
+    """
+    state: mapping holding the session (st.session_state or a dict); missing keys
+      are filled from default_state()
+    emit: callable(event) receiving 'answer' / 'level' events (e.g. EventLog.emit)
+    deck_seeding: "daily", "fixed" or "off" (see generators.level_seed)
+    progress_detail: "summary" or "full" (keep per-question details in level_progress)
+    adaptive: Math Quiz picks each topic from the player's mastery instead of
+      serving the shared level deck, and a level can end early once mastered
+    dedup_lookback: earlier levels whose questions are not served again (besides
+      the current level); a repeated deck question is swapped for a fresh one
+      (and the level's result no longer claims the deck seed). Replaying a
+      recent seeded deck serves it unchanged, so a retry is the same shared deck.
+    bank: question_bank.QuestionBank to serve decks and questions from instead of
+      generating them (grades / modes the bank lacks still generate)
+    clock: time source, injectable for simulations
+    """
+
+    def __init__(self, state=None, emit=None, pass_percent=PASS_PERCENT, deck_seeding="daily",
+                 progress_detail="summary", adaptive=False, dedup_lookback=LOOKBACK_LEVELS, bank=None,
+                 clock=time.time, rng=random):
+        self.state = {} if state is None else state
+        self.emit = emit
+        self.pass_percent = pass_percent
+        self.deck_seeding = deck_seeding
+        self.progress_detail = progress_detail
+        self.adaptive = adaptive
+        self.dedup_lookback = dedup_lookback
+        self.bank = bank
+        self.clock = clock
+        self.rng = rng
+        self.init_state()
+
+    def init_state(self):
+        state = self.state
+        for k, v in default_state().items():
+            if k not in state:
+                state[k] = v
+
+    # ---------------------------
+    # Progress
+    # ---------------------------
+    def hydrate(self, store):
+        """
+        Merge the player's saved progress in, once per session and player. A
+        different player (name changed) starts from the defaults, not from the
+        previous player's unlocks and results.
+        """
+        player = self.state['player_name']
+        if self.state.get('progress_player') == player:
+            return False
+        return self.merge_saved(player, store.load(player))
+
+    def merge_saved(self, player, saved):
+        """
+        hydrate() with the store read done by the caller (saved = store.load(player)),
+        e.g. off an event loop while the merge stays on it. Ignored when the session
+        has been hydrated since or has switched to another player.
+        """
+        state = self.state
+        previous = state.get('progress_player')
+        if previous == player or state['player_name'] != player:
+            return False
+        if previous is not None:
+            fresh = default_state()
+            for key in ('level_unlocked', 'level_progress', 'level_progress_packed', 'mastery'):
+                state[key] = fresh[key]
+        state['progress_player'] = player
+        locked = saved.get("level_unlocked", {})
+        if isinstance(locked, dict):
+            for g, lst in locked.items():
+                state["level_unlocked"].setdefault(str(g), LevelSet((1,))).update(lst)
+        lp = saved.get("level_progress", {})
+        if isinstance(lp, dict):
+            for g, obj in lp.items():
+                state["level_progress"].setdefault(str(g), {}).update({str(lvl): data for lvl, data in obj.items()})
+        self.mastery.merge(saved.get("mastery"))
+        self.pack_progress(state['grade'])
+        return True
+
+    def pack_progress(self, keep_grade):
+        """Pack every grade's level summaries except keep_grade's (they are already in the progress store)."""
+        progress, packed = self.state['level_progress'], self.state['level_progress_packed']
+        for g in [g for g in progress if g != str(keep_grade)]:
+            levels = unpack_progress(packed.get(g, b""))
+            levels.update(progress.pop(g))
+            packed[g] = pack_progress(levels)
+
+    def progress_snapshot(self, store=None, saved=None):
+        """
+        JSON-friendly copy of the session progress (unlocked sets -> sorted lists).
+        Packed grades only know percent / passed; with a store (or its already
+        loaded `saved` progress) their full summaries are read back from it.
+        """
+        state = self.state
+        progress = {}
+        if state['level_progress_packed']:
+            if saved is None and store is not None:
+                saved = store.load(state['player_name'])
+            saved = (saved or {}).get('level_progress', {})
+            for g, levels in state['level_progress_packed'].items():
+                full = saved.get(g) if isinstance(saved.get(g), dict) else {}
+                progress[g] = {lvl: full.get(lvl, summary) for lvl, summary in unpack_progress(levels).items()}
+        for g, levels in state['level_progress'].items():
+            progress.setdefault(g, {}).update(levels)
+        return {
+            'level_unlocked': {g: sorted(lvls) for g, lvls in state['level_unlocked'].items()},
+            'level_progress': progress,
+            'mastery': self.mastery_snapshot(),
+        }
+
+    @property
+    def mastery(self):
+        return Mastery(self.state['mastery'])
+
+    def mastery_snapshot(self):
+        return {t: list(entry) for t, entry in self.state['mastery'].items()}
+
+    def is_unlocked(self, grade, level):
+        return level in self.state['level_unlocked'].get(str(grade), {1})
+
+    def unlock(self, grade, level):
+        if level <= LEVELS_PER_GRADE:
+            self.state['level_unlocked'].setdefault(str(grade), LevelSet((1,))).add(level)
+
+    # ---------------------------
+    # Footprint, parking
+    # ---------------------------
+    def footprint(self):
+        """Bytes held by this session's state (shared decks excluded)."""
+        return session_bytes(self.state)
+
+    def park(self):
+        """
+        Small JSON-friendly snapshot of what the progress store doesn't hold; a
+        level in progress is abandoned (like closing the tab mid-level).
+        """
+        snap = {k: self.state[k] for k in PARK_KEYS}
+        snap['level_unlocked'] = {g: sorted(lvls) for g, lvls in self.state['level_unlocked'].items()}
+        return snap
+
+    def resume(self, snapshot):
+        """Reset the state to defaults plus a park() snapshot; the next hydrate() reloads saved progress."""
+        state = self.state
+        fresh = default_state()
+        fresh.update({k: snapshot[k] for k in PARK_KEYS if k in snapshot})
+        fresh['level_unlocked'].update({g: LevelSet(lvls) for g, lvls in snapshot.get('level_unlocked', {}).items()})
+        for k, v in fresh.items():
+            state[k] = v
+
+    # ---------------------------
+    # Core game control: start level, next question, record answer
+    # ---------------------------
+    def deck_seed(self, grade, level, mode):
+        if self.deck_seeding == "off":
+            return None
+        salt = self.state.get('class_code', '').strip()
+        if self.deck_seeding == "daily":
+            salt = f"{datetime.utcfromtimestamp(self.clock()).date().isoformat()}|{salt}"
+        return level_seed(grade, level, mode, salt)
+
+    def seen_questions(self):
+        index = self.state.get('seen_questions')
+        capacity = (max(0, self.dedup_lookback) + 1) * QUESTIONS_PER_LEVEL
+        if not isinstance(index, QuestionIndex) or index.capacity != capacity:
+            index = self.state['seen_questions'] = QuestionIndex(capacity)
+        return index
+
+    def _seen_deck(self, key):
+        """Whether the seeded deck `key` was served within the dedup lookback; records it."""
+        decks = self.state.get('seen_decks')
+        if not isinstance(decks, deque) or decks.maxlen != max(0, self.dedup_lookback) + 1:
+            decks = self.state['seen_decks'] = deque(decks or (), maxlen=max(0, self.dedup_lookback) + 1)
+        if key in decks:
+            return True
+        decks.append(key)
+        return False
+
+    def start_level(self, grade, level):
+        state = self.state
+        # ensure unlocked
+        if not self.is_unlocked(grade, level):
+            return False
+        state['grade'], state['current_level'] = grade, level
+        state['attempt'] = uuid.uuid4().hex[:16]
+        # reset counters
+        state['started'] = True
+        state['question_index'] = 0
+        state['correct_in_level'] = 0
+        state['current_q'] = None
+        state['current_ans'] = None
+        state['current_choices'] = None
+        state['question_start_time'] = None
+        state['score'] = state.get('score', 0)
+        state['recent_history'] = deque(maxlen=HISTORY_SIZE)
+        state['show_result'] = False
+        state['last_result'] = None
+        state['auto_clear'] = False
+        self.pack_progress(grade)
+        mode = state['mode']
+        if self.adaptive and mode == 'Math Quiz':
+            # questions are picked one at a time from the player's mastery
+            seed = None
+            state['level_deck'] = None
+        else:
+            seed = self.deck_seed(grade, level, mode)
+            state['level_deck'] = {'mode': mode, 'seed': seed, 'questions': self._build_deck(grade, level, mode, seed),
+                                   'replay': self._seen_deck((grade, level, mode, seed)) if seed is not None else False}
+        state['level_results'] = LevelResult(grade, level, seed, self.pass_percent)
+        self.next_question()
+        return True
+
+    def _build_deck(self, grade, level, mode, seed):
+        if self.bank is not None:
+            if seed is None:
+                deck = self.bank.deck(grade, level, mode, QUESTIONS_PER_LEVEL, self.rng)
+            else:
+                deck = self.bank.seeded_deck(grade, level, mode, QUESTIONS_PER_LEVEL, seed)
+            if deck is not None:
+                return deck
+        return generate_level(grade, level, mode, seed=seed)
+
+    def next_question(self):
+        state = self.state
+        # serve from the level deck; generate on the spot when adaptive or the deck doesn't fit (e.g. mode switched mid-level)
+        deck = state.get('level_deck')
+        idx = state['question_index']
+        if deck and deck['mode'] == state['mode'] and idx < len(deck['questions']):
+            qdict = deck['questions'][idx]
+            if deck.get('replay'):
+                # a retry of a recent deck: its questions are all "seen", serve them as they are
+                self.seen_questions().add(fingerprint(qdict['question']))
+            else:
+                # decks hold no repeats themselves; this catches questions from the last few levels
+                qdict = draw_unique(self._draw_question, self.seen_questions(), first=qdict)
+                results = state.get('level_results')
+                if qdict is not deck['questions'][idx] and isinstance(results, LevelResult):
+                    results.seed = None  # no longer the shared deck
+        else:
+            qdict = draw_unique(self._draw_question, self.seen_questions())
+        state['current_q'] = qdict
+        state['current_ans'] = qdict['answer']
+        state['current_choices'] = qdict.get('choices', None)
+        state['question_start_time'] = self.clock()
+        state['shape_key'] = f"shape_{self.rng.randint(100000,999999)}"
+        # set flag to clear input safely on render
+        state['auto_clear'] = True
+
+    def _draw_question(self):
+        state = self.state
+        grade, level = state['grade'], state['current_level']
+        topic = None
+        if self.adaptive and state['mode'] == 'Math Quiz':
+            topic = choose_adaptive_topic(grade, self.mastery, level, self.rng)
+        if self.bank is not None:
+            qdict = self.bank.draw(grade, self.rng, level, state['mode'], topic=topic)
+            if qdict is not None:
+                return qdict
+        if state['mode'] == 'Math Quiz':
+            # off-deck questions only get MCQ options when they will be shown
+            return generate_question_for_grade(grade, self.rng, choices=bool(state.get('mcq')), level=level, topic=topic)
+        return gen_shape_question(grade, self.rng, level)
+
+    def record_answer(self, given_raw):
+        """
+        given_raw: can be string, int, float or empty string
+        Call only when the player explicitly submits (Enter / Submit) or times out.
+        Returns True when the answer was correct.
+        """
+        state = self.state
+        qdict = state.get('current_q') or {}
+        correct = state.get('current_ans')
+        topic = qdict.get('topic', None)
+        now = self.clock()
+        started = state.get('question_start_time')
+        time_taken = round(now - started, 2) if started else None
+
+        given = given_raw
+        # normalize blanks
+        if isinstance(given, str) and given.strip() == '':
+            given = ''
+
+        # Evaluate correctness (fractions, mixed numbers, H:M, matrices, yes/no ...)
+        is_correct = grade_answer(given, correct)
+
+        # append to the level's packed results (question dict is referenced, not copied)
+        results = state.get('level_results')
+        if not isinstance(results, LevelResult):
+            results = LevelResult(state['grade'], state['current_level'], None, self.pass_percent)
+            state['level_results'] = results
+        results.add(qdict, given, is_correct, time_taken, now)
+        event_base = {
+            "session": state['session_id'],
+            "attempt": state.get('attempt'),
+            "player": state.get('player_name','Player'),
+            "grade": state.get('grade'),
+            "level": state.get('current_level'),
+        }
+        if self.emit:
+            self.emit(dict(event_base, type="answer", ts=now,
+                timestamp=datetime.utcfromtimestamp(now).isoformat(),
+                q_no=len(results), question=qdict.get('question', ''), given=given,
+                correct_answer=correct, is_correct=bool(is_correct), time_taken=time_taken, topic=topic))
+
+        # update counters
+        state['question_index'] += 1
+        if is_correct:
+            state['correct_in_level'] += 1
+            state['score'] = state.get('score',0) + 10
+        elif topic:
+            state['weak_topics'][topic] = state['weak_topics'].get(topic, 0) + 1
+        if topic:
+            self.mastery.update(topic, is_correct, state['current_level'], time_taken, state.get('time_limit'))
+
+        # append short history (ring buffer of the last HISTORY_SIZE answers)
+        state['recent_history'].append((qdict.get('question', ''), given, bool(is_correct)))
+
+        # level finished?
+        if state['question_index'] >= QUESTIONS_PER_LEVEL or self._mastered_early():
+            self._finish_level(results, event_base)
+        else:
+            self.next_question()
+        return is_correct
+
+    def _mastered_early(self):
+        state = self.state
+        return (self.adaptive and state['mode'] == 'Math Quiz'
+                and state['question_index'] >= ADAPTIVE_MIN_QUESTIONS
+                and state['correct_in_level'] == state['question_index']
+                and grade_mastered(state['grade'], self.mastery, state['current_level']))
+
+    def _finish_level(self, results, event_base):
+        state = self.state
+        # compute result (details stay in level_results until the next level starts)
+        last = results.summary()
+        state['last_result'] = last
+        state['show_result'] = True
+
+        # save in session level_progress: summary only unless configured to keep details
+        g = str(state['grade'])
+        lvl = str(state['current_level'])
+        saved = results.to_dict(with_details=self.progress_detail == "full")
+        state['level_progress'].setdefault(g, {})[lvl] = saved
+
+        # unlock next level if passed
+        next_lvl = state['current_level'] + 1
+        unlock = next_lvl if last['passed'] and next_lvl <= LEVELS_PER_GRADE else None
+        if unlock:
+            self.unlock(state['grade'], unlock)
+
+        # persist: the event sink (event log writer) upserts progress and appends leaderboard rows
+        if self.emit:
+            self.emit(dict(event_base, type="level", result=saved, unlock=unlock, mastery=self.mastery_snapshot()))
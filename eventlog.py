@@ -0,0 +1,239 @@
+# eventlog.py
+"""
+Math Hero — append-only answer event log
+- EventLog.emit: enqueue an event (dict); never touches the disk on the caller's thread
+- one background writer thread appends batches as JSON lines, fsyncs per policy,
+  then hands each batch to projections (handlers) that derive the other views
+- LeaderboardProjection / ProgressProjection: rebuild leaderboard rows and saved
+  progress from 'answer' and 'level' events
+- replay: feed an existing log through projections (rebuild after a wipe)
+
+Events:
+  {"type": "answer", "ts", "session", "attempt", "player", "grade", "level", "q_no", "question",
+   "given", "correct_answer", "is_correct", "time_taken", "topic"}
+  {"type": "level", "ts", "session", "attempt", "player", "grade", "level", "result", "unlock", "mastery"}
+"attempt" identifies one play of a level (a restart starts a new one); logs
+written before it existed group by session, grade and level.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from filelocks import locked
+
+EVENT_LOG_FILE = "math_hero_events.jsonl"
+PENDING_TTL = 24 * 60 * 60  # seconds without an answer before an unfinished level's answers are dropped
+FSYNC_POLICIES = ("always", "interval", "never")
+
+class _Flush:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+_STOP = object()
+
+class EventLog:
+    def __init__(self, path=EVENT_LOG_FILE, fsync="interval", fsync_interval=1.0,
+                 batch_size=256, handlers=()):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.handlers = list(handlers)
+        self._queue = queue.Queue()
+        self._last_sync = 0.0
+        self._thread = threading.Thread(target=self._run, name="math-hero-eventlog", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_handler(self, handler):
+        """handler(events) is called on the writer thread after each written batch."""
+        self.handlers.append(handler)
+
+    def emit(self, event):
+        event.setdefault("ts", time.time())
+        self._queue.put(event)
+
+    def flush(self, timeout=None):
+        """Block until everything emitted so far is written and handled."""
+        if not self._thread.is_alive():
+            return False
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # ---------------------------
+    # Writer thread
+    # ---------------------------
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                batch, markers, stop = [], [], False
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, _Flush):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(f, batch)
+                    self._dispatch(batch)
+                for m in markers:
+                    m.done.set()
+                if stop:
+                    return
+
+    def _write(self, f, batch):
+        try:
+            data = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in batch)
+            with locked(f):  # other server processes may share the log
+                f.write(data)
+                f.flush()
+            now = time.time()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+                os.fsync(f.fileno())
+                self._last_sync = now
+        except Exception as e:
+            print("Error writing event log:", e)
+
+    def _dispatch(self, batch):
+        for handler in self.handlers:
+            try:
+                handler(batch)
+            except Exception as e:
+                print("Error in event handler:", e)
+
+# ---------------------------
+# Projections
+# ---------------------------
+class LeaderboardProjection:
+    """
+    Buffers a level attempt's answer events and appends them as leaderboard rows
+    when it ends. Attempts abandoned midway are dropped after pending_ttl seconds
+    (event time) without a new answer.
+    """
+
+    def __init__(self, leaderboard, write_csv=True, pending_ttl=PENDING_TTL):
+        self.leaderboard = leaderboard
+        self.write_csv = write_csv
+        self.pending_ttl = pending_ttl
+        self._pending = OrderedDict()  # attempt -> answer events, least recently answered first
+
+    def __call__(self, events):
+        for e in events:
+            key = e.get("attempt") or (e.get("session"), e.get("grade"), e.get("level"))
+            if e.get("type") == "answer":
+                if e.get("q_no") == 1:
+                    self._pending[key] = [e]  # a restart of an old-style (attempt-less) key begins afresh
+                else:
+                    self._pending.setdefault(key, []).append(e)
+                self._pending.move_to_end(key)
+            elif e.get("type") == "level":
+                answers = self._pending.pop(key, [])
+                percent = (e.get("result") or {}).get("percent", 0)
+                rows = [{
+                    "timestamp": a.get("timestamp"),
+                    "player": a.get("player", "Player"),
+                    "grade": a.get("grade"),
+                    "level": a.get("level"),
+                    "q_no": a.get("q_no"),
+                    "question": a.get("question"),
+                    "given": a.get("given"),
+                    "correct_answer": a.get("correct_answer"),
+                    "is_correct": int(bool(a.get("is_correct"))),
+                    "time_taken": a.get("time_taken"),
+                    "percent_level": percent,
+                } for a in answers]
+                if rows:
+                    if self.write_csv:
+                        self.leaderboard.append(rows)
+                    else:
+                        self.leaderboard.record(rows)
+        self._expire(events)
+
+    def _expire(self, events):
+        stamps = [e["ts"] for e in events if isinstance(e.get("ts"), (int, float))]
+        if not stamps:
+            return
+        cutoff = max(stamps) - self.pending_ttl
+        while self._pending:
+            key, answers = next(iter(self._pending.items()))
+            ts = answers[-1].get("ts")
+            if not isinstance(ts, (int, float)) or ts > cutoff:
+                break
+            del self._pending[key]
+
+class ProgressProjection:
+    """Upserts finished levels (and unlocks, topic mastery) into a ProgressStore."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, events):
+        for e in events:
+            if e.get("type") == "level":
+                self.store.save_level(e.get("player", "Player"), e.get("grade"), e.get("level"),
+                                      e.get("result"), unlock=e.get("unlock"))
+                if e.get("mastery"):
+                    self.store.save_mastery(e.get("player", "Player"), e["mastery"])
+
+def iter_events(path=EVENT_LOG_FILE):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+
+def replay(path=EVENT_LOG_FILE, handlers=(), batch_size=1000):
+    """Feed every event in the log to handlers in order; returns the event count."""
+    count = 0
+    batch = []
+    for e in iter_events(path):
+        batch.append(e)
+        if len(batch) >= batch_size:
+            for h in handlers:
+                h(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        for h in handlers:
+            h(batch)
+        count += len(batch)
+    return count
+
+if __name__ == "__main__":
+    # rebuild derived views from the log: python eventlog.py [events.jsonl]
+    import sys
+    from leaderboard import Leaderboard
+    from progress_store import open_progress_store
+    lb = Leaderboard()
+    path = sys.argv[1] if len(sys.argv) > 1 else EVENT_LOG_FILE
+    lb.reset()
+    n = replay(path, [LeaderboardProjection(lb, write_csv=False), ProgressProjection(open_progress_store(os.environ.get("MATH_HERO_PROGRESS_BACKEND", "sqlite")))])
+    print(f"Replayed {n} events from {path}")
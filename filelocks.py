@@ -0,0 +1,68 @@
+# filelocks.py
+"""
+Math Hero — cross-process file locking and atomic snapshots
+- locked(f): exclusive advisory lock on an open file (fcntl.flock, msvcrt on Windows)
+- lock_path(path): exclusive lock on a sidecar "<path>.lock" file
+- atomic_write_text(path, text, backup=True): write-temp + fsync + rename, keeping the
+  previous snapshot as "<path>.bak" (atomic_write_bytes for binary files)
+"""
+
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+@contextlib.contextmanager
+def locked(f):
+    """Hold an exclusive lock on open file f for the duration of the block."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        pos = f.tell()
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        f.seek(pos)
+        try:
+            yield f
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextlib.contextmanager
+def lock_path(path):
+    with open(path + ".lock", "a+b") as f:
+        with locked(f):
+            yield
+
+def backup_path(path):
+    return path + ".bak"
+
+def atomic_write_text(path, text, backup=True):
+    """Readers see either the old or the new file, never a truncated one."""
+    atomic_write_bytes(path, text.encode("utf-8"), backup)
+
+def atomic_write_bytes(path, data, backup=True):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if backup and os.path.exists(path):
+            # last good snapshot; if we die between the two renames the loader falls back to it
+            os.replace(path, backup_path(path))
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,53 @@
+# footprint.py
+"""
+Math Hero — session memory footprint
+deep_sizeof() adds up sys.getsizeof over everything reachable from an object
+(containers, __slots__ and __dict__ attributes), counting each object once.
+session_bytes() applies it to a session's state but leaves out what sessions
+share: a seeded level deck is one cached tuple per process
+(generators.generate_level, QuestionBank.seeded_deck), so a session only pays
+for its references to it.
+"""
+
+import sys
+from array import array
+from collections import deque
+
+_LEAVES = (str, bytes, bytearray, int, float, bool, type(None), array)
+
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, _LEAVES):
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        else:
+            for name in getattr(type(o), "__slots__", ()):
+                if hasattr(o, name):
+                    stack.append(getattr(o, name))
+            if hasattr(o, "__dict__"):
+                stack.append(o.__dict__)
+    return total
+
+def shared_objects(state):
+    """ids of objects a session references but does not own (a seeded deck and everything in it)."""
+    seen = set()
+    deck = state.get('level_deck')
+    if deck and deck.get('seed') is not None:
+        deep_sizeof(deck['questions'], seen)
+    return seen
+
+def session_bytes(state):
+    """Bytes held by one session's state, excluding shared objects."""
+    return deep_sizeof(dict(state), shared_objects(state))
@@ -0,0 +1,617 @@
+# generators.py
+"""
+Math Hero — question generators
+- gen_*: one function per topic, returning (question_text, answer)
+- problem spaces: every question a topic can produce, by index (problem_space,
+  space_size, generate_by_index, sample_topic for draws without repeats)
+- Generator registry: topic -> generator, display topic, grades, weight
+  (built once at import; add curriculum with register_generator)
+- choose_topic / generate_question_for_grade: weighted per-grade sampling + O(1) dispatch
+- level_scale: operand ranges grow with the level inside a grade (generators taking `level`)
+- gen_shape_question: Shape Challenge questions with a drawn figure
+- MCQ choices from distractors.make_choices: shape questions always, Math Quiz
+  questions on request (decks always carry them; the UI decides to show them)
+- generate_level: the whole deck for a level in one batch, optionally seeded
+  (level_seed) so identical decks are built once and shared
+No Streamlit imports here, so the generators can be used headless.
+"""
+
+import bisect
+import functools
+import hashlib
+import inspect
+import itertools
+import math
+import random
+from collections import namedtuple
+from dedup import QuestionIndex, draw_unique
+from distractors import make_choices
+from shapes import shape_key, render_shape
+from spaces import Combinations, Dependent, Mapped, Product, Union, sample
+
+GRADES = range(2, 11)
+LEVELS_PER_GRADE = 20
+QUESTIONS_PER_LEVEL = 10
+
+# ---------------------------
+# Level scaling
+# ---------------------------
+def level_scale(level):
+    """Operand range factor: 0.5 at level 1, 1.0 mid-grade, 1.5 at the last level."""
+    return 0.5 + (min(max(int(level), 1), LEVELS_PER_GRADE) - 1) / (LEVELS_PER_GRADE - 1)
+
+def _hi(lo, hi, level):
+    # upper bound of randint(lo, hi) stretched by level; level=None keeps the original range
+    if level is None:
+        return hi
+    return max(lo, lo + round((hi - lo) * level_scale(level)))
+
+# ---------------------------
+# Question Generators
+# ---------------------------
+# Each topic has a formatter (_*_q: parameters -> (question_text, answer)), the
+# random generator gen_* that draws the parameters, and a problem space
+# (_*_space: grade, level -> every parameter combination gen_* can draw, mapped
+# through the same formatter; see spaces.py and generate_by_index).
+def _span(lo, hi, level=None):
+    # the values rng.randint(lo, _hi(lo, hi, level)) can return
+    return range(lo, _hi(lo, hi, level) + 1)
+
+def _star(fmt):
+    return lambda params: fmt(*params)
+
+def _subtypes(*fmts):
+    # items of a spaces.Union: (part number, params) -> that part's formatter
+    return lambda item: fmts[item[0]](*item[1])
+
+# basic 2-4
+def _addition_q(a, b):
+    return f"{a} + {b} = ?", a + b
+
+def gen_addition(grade, rng=random, level=None):
+    a = rng.randint(1, _hi(1, 10*grade, level))
+    b = rng.randint(1, _hi(1, 10*grade, level))
+    return _addition_q(a, b)
+
+def _addition_space(grade, level=None):
+    return Mapped(Product(_span(1, 10*grade, level), _span(1, 10*grade, level)), _star(_addition_q))
+
+def _subtraction_q(a, b):
+    return f"{a} - {b} = ?", a - b
+
+def gen_subtraction(grade, rng=random, level=None):
+    a = rng.randint(1, _hi(1, 10*grade, level))
+    b = rng.randint(1, a)
+    return _subtraction_q(a, b)
+
+def _subtraction_space(grade, level=None):
+    return Mapped(Dependent(_span(1, 10*grade, level), lambda a: range(1, a + 1)), _star(_subtraction_q))
+
+def _multiplication_q(a, b):
+    return f"{a} × {b} = ?", a*b
+
+def gen_multiplication(grade, rng=random, level=None):
+    a = rng.randint(1, _hi(1, max(3, grade+2), level))
+    b = rng.randint(1, _hi(1, 12, level))
+    return _multiplication_q(a, b)
+
+def _multiplication_space(grade, level=None):
+    return Mapped(Product(_span(1, max(3, grade+2), level), _span(1, 12, level)), _star(_multiplication_q))
+
+def _division_q(b, c):
+    return f"{b*c} ÷ {b} = ?", c
+
+def gen_division(grade, rng=random, level=None):
+    b = rng.randint(1, _hi(1, min(12, grade+6), level))
+    c = rng.randint(1, _hi(1, 12, level))
+    return _division_q(b, c)
+
+def _division_space(grade, level=None):
+    return Mapped(Product(_span(1, min(12, grade+6), level), _span(1, 12, level)), _star(_division_q))
+
+def _comparison_q(a, b):
+    ans = ">" if a > b else "<" if a < b else "="
+    return f"Which is greater: {a} or {b}? Write '>' or '<' or '='.", ans
+
+def gen_comparison(grade, rng=random, level=None):
+    a = rng.randint(0, _hi(0, 50, level))
+    b = rng.randint(0, _hi(0, 50, level))
+    return _comparison_q(a, b)
+
+def _comparison_space(grade, level=None):
+    return Mapped(Product(_span(0, 50, level), _span(0, 50, level)), _star(_comparison_q))
+
+def _story_q(a, b):
+    return f"Ali had {a} apples. He gave {b} apples. How many left?", a - b
+
+def gen_story(grade, rng=random, level=None):
+    a = rng.randint(5, _hi(5, 50, level))
+    b = rng.randint(1, min(10, a))
+    return _story_q(a, b)
+
+def _story_space(grade, level=None):
+    return Mapped(Dependent(_span(5, 50, level), lambda a: range(1, min(10, a) + 1)), _star(_story_q))
+
+# fractions
+def _fraction_add_q(d, a, b):
+    num = a + b
+    den = d
+    g = math.gcd(num, den)
+    frac = f"{num//g}/{den//g}"
+    dec = round(num/den, 3)
+    return f"{a}/{d} + {b}/{d} = ? (fraction or decimal)", {"fraction":frac, "decimal":dec}
+
+def gen_fraction_add(grade, rng=random, level=None):
+    d = rng.randint(2, _hi(2, 8, level))
+    a = rng.randint(1, d-1)
+    b = rng.randint(1, d-1)
+    return _fraction_add_q(d, a, b)
+
+def _fraction_add_space(grade, level=None):
+    return Mapped(Dependent(_span(2, 8, level), lambda d: Product(range(1, d), range(1, d))),
+                  lambda item: _fraction_add_q(item[0], *item[1]))
+
+def _fraction_mixed_q(num, den):
+    whole = num // den
+    rem = num % den
+    if rem == 0:
+        return f"Write {num}/{den} as mixed number.", str(whole)
+    else:
+        return f"Write {num}/{den} as mixed number.", f"{whole} {rem}/{den}"
+
+def gen_fraction_mixed(grade, rng=random, level=None):
+    num = rng.randint(5, _hi(5, 20, level))
+    den = rng.randint(2, _hi(2, 8, level))
+    return _fraction_mixed_q(num, den)
+
+def _fraction_mixed_space(grade, level=None):
+    return Mapped(Product(_span(5, 20, level), _span(2, 8, level)), _star(_fraction_mixed_q))
+
+# LCM/HCF
+def _lcm_q(a, b):
+    return f"Find LCM of {a} and {b}.", (a*b)//math.gcd(a,b)
+
+def gen_lcm(grade, rng=random, level=None):
+    a = rng.randint(2, _hi(2, 20, level))
+    b = rng.randint(2, _hi(2, 20, level))
+    return _lcm_q(a, b)
+
+def _lcm_space(grade, level=None):
+    return Mapped(Product(_span(2, 20, level), _span(2, 20, level)), _star(_lcm_q))
+
+def _hcf_q(a, b):
+    return f"Find HCF (GCD) of {a} and {b}.", math.gcd(a,b)
+
+def gen_hcf(grade, rng=random, level=None):
+    a = rng.randint(2, _hi(2, 40, level))
+    b = rng.randint(2, _hi(2, 40, level))
+    return _hcf_q(a, b)
+
+def _hcf_space(grade, level=None):
+    return Mapped(Product(_span(2, 40, level), _span(2, 40, level)), _star(_hcf_q))
+
+# percentage / profit-loss
+_PERCENTS = (5, 10, 15, 20, 25)
+
+def _percentage_q(base, p):
+    return f"What is {p}% of {base}?", round(base * p/100, 2)
+
+def gen_percentage(grade, rng=random, level=None):
+    base = rng.randint(10, _hi(10, 300, level))
+    p = rng.choice(_PERCENTS)
+    return _percentage_q(base, p)
+
+def _percentage_space(grade, level=None):
+    return Mapped(Product(_span(10, 300, level), _PERCENTS), _star(_percentage_q))
+
+def _profit_q(cp, p):
+    sp = round(cp * (1 + p/100), 2)
+    return f"Cost price = {cp}. Profit = {p}%. Find selling price.", sp
+
+def gen_profit(grade, rng=random, level=None):
+    cp = rng.randint(50, _hi(50, 600, level))
+    p = rng.choice(_PERCENTS)
+    return _profit_q(cp, p)
+
+def _profit_space(grade, level=None):
+    return Mapped(Product(_span(50, 600, level), _PERCENTS), _star(_profit_q))
+
+# geometry basics
+def _area_rectangle_q(l, w):
+    return f"Area of rectangle length={l} and width={w} = ?", l*w
+
+def gen_area_rectangle(grade, rng=random, level=None):
+    l = rng.randint(2, _hi(2, 20, level))
+    w = rng.randint(1, _hi(1, 15, level))
+    return _area_rectangle_q(l, w)
+
+def _area_rectangle_space(grade, level=None):
+    return Mapped(Product(_span(2, 20, level), _span(1, 15, level)), _star(_area_rectangle_q))
+
+def _perimeter_rectangle_q(l, w):
+    return f"Perimeter of rectangle length={l} and width={w} = ?", 2*(l+w)
+
+def gen_perimeter_rectangle(grade, rng=random, level=None):
+    l = rng.randint(2, _hi(2, 20, level))
+    w = rng.randint(1, _hi(1, 15, level))
+    return _perimeter_rectangle_q(l, w)
+
+def _perimeter_rectangle_space(grade, level=None):
+    return Mapped(Product(_span(2, 20, level), _span(1, 15, level)), _star(_perimeter_rectangle_q))
+
+# advanced
+def _function_eval_q(a, b, x):
+    return f"If f(x) = {a}x + {b}, find f({x}).", a*x + b
+
+def gen_function_eval(grade, rng=random, level=None):
+    a = rng.randint(1, _hi(1, 5, level))
+    b = rng.randint(0, _hi(0, 10, level))
+    x = rng.randint(1, _hi(1, 10, level))
+    return _function_eval_q(a, b, x)
+
+def _function_eval_space(grade, level=None):
+    return Mapped(Product(_span(1, 5, level), _span(0, 10, level), _span(1, 10, level)), _star(_function_eval_q))
+
+def _set_membership_q(members, x):
+    return f"Given set A = {sorted(members)}. Is {x} in A? Answer 'yes' or 'no'.", "yes"
+
+def gen_set_membership(grade, rng=random):
+    A = set(rng.sample(range(1,25), 5))
+    x = rng.choice(list(A))
+    return _set_membership_q(A, x)
+
+def _set_membership_space(grade, level=None):
+    return Mapped(Product(Combinations(range(1, 25), 5), range(5)), lambda p: _set_membership_q(p[0], p[0][p[1]]))
+
+_TRIG = ((30, 0.5), (45, round(math.sqrt(2)/2, 3)), (60, round(math.sqrt(3)/2, 3)))
+
+def _trig_basic_q(ang, val):
+    return f"What is sin({ang}°)? (approx)", val
+
+def gen_trig_basic(grade, rng=random):
+    ang, val = rng.choice(_TRIG)
+    return _trig_basic_q(ang, val)
+
+def _trig_basic_space(grade, level=None):
+    return Mapped(_TRIG, _star(_trig_basic_q))
+
+def _slope_q(x1, y1, dx, dy):
+    x2 = x1 + dx; y2 = y1 + dy
+    s = round((y2-y1)/(x2-x1), 3)
+    return f"Find slope of line through ({x1},{y1}) and ({x2},{y2}).", s
+
+def gen_slope(grade, rng=random):
+    x1 = rng.randint(0,5); y1 = rng.randint(0,5)
+    dx = rng.randint(1,6); dy = rng.randint(-3,6)
+    return _slope_q(x1, y1, dx, dy)
+
+def _slope_space(grade, level=None):
+    return Mapped(Product(range(0, 6), range(0, 6), range(1, 7), range(-3, 7)), _star(_slope_q))
+
+def _matrix_add_q(a, b, c, d, e, f_, g, h):
+    return f"Add matrices [[{a},{b}],[{c},{d}]] + [[{e},{f_}],[{g},{h}]]. Write result [[x,y],[z,w]].", f"[[{a+e},{b+f_}],[{c+g},{d+h}]]"
+
+def gen_matrix_add(grade, rng=random, level=None):
+    return _matrix_add_q(*[rng.randint(0, _hi(0, 5, level)) for _ in range(8)])
+
+def _matrix_add_space(grade, level=None):
+    return Mapped(Product(*[_span(0, 5, level)] * 8), _star(_matrix_add_q))
+
+# ---------------------------
+# Grade 4-5 special generators
+# ---------------------------
+def _factor_check_q(a, k):
+    return f"Is {a} a factor of {a * k}? Answer 'yes' or 'no'.", "yes"
+
+def _common_multiple_q(a, b):
+    # the first multiple of a that b divides: lcm(a, b)
+    return f"Find a small common multiple of {a} and {b}.", (a*b)//math.gcd(a,b)
+
+def _gcf_q(a, b):
+    return f"Find the GCF (HCF) of {a} and {b}.", math.gcd(a,b)
+
+def gen_factors_multiples(grade, rng=random):
+    typ = rng.choice(['factor_check','common_multiple','gcf'])
+    if typ == 'factor_check':
+        a = rng.randint(2,12)
+        return _factor_check_q(a, rng.randint(2,6))
+    elif typ == 'common_multiple':
+        a = rng.randint(2,8); b = rng.randint(2,8)
+        return _common_multiple_q(a, b)
+    else:
+        a = rng.randint(2, 12); b = rng.randint(2, 12)
+        return _gcf_q(a, b)
+
+def _factors_multiples_space(grade, level=None):
+    return Mapped(Union(Product(range(2, 13), range(2, 7)), Product(range(2, 9), range(2, 9)),
+                        Product(range(2, 13), range(2, 13))),
+                  _subtypes(_factor_check_q, _common_multiple_q, _gcf_q))
+
+def _decimal_add_q(a, b):
+    return f"{a} + {b} = ? (round to 2 decimals)", round(a+b,2)
+
+def _decimal_sub_q(a, b):
+    return f"{a} - {b} = ? (round to 2 decimals)", round(a-b,2)
+
+def _decimal_mul_q(a, b):
+    return f"{a} × {b} = ? (round to 2 decimals)", round(a*b,2)
+
+def gen_decimals(grade, rng=random):
+    typ = rng.choice(['add','sub','mul'])
+    if typ == 'add':
+        a = round(rng.uniform(0.1, 9.9),2); b = round(rng.uniform(0.1, 9.9),2)
+        return _decimal_add_q(a, b)
+    if typ == 'sub':
+        a = round(rng.uniform(1, 15),2); b = round(rng.uniform(0.1, min(9.9, a-0.1)),2)
+        return _decimal_sub_q(a, b)
+    a = round(rng.uniform(0.5,5),2); b = round(rng.uniform(0.5,5),2)
+    return _decimal_mul_q(a, b)
+
+def _cents(fmt):
+    # space parameters are whole hundredths, so every 2-decimal value is counted once
+    return lambda a, b: fmt(a / 100, b / 100)
+
+def _decimals_space(grade, level=None):
+    return Mapped(Union(Product(range(10, 991), range(10, 991)),
+                        Dependent(range(100, 1501), lambda a: range(10, min(990, a - 10) + 1)),
+                        Product(range(50, 501), range(50, 501))),
+                  _subtypes(_cents(_decimal_add_q), _cents(_decimal_sub_q), _cents(_decimal_mul_q)))
+
+_CONVERT_MINUTES = (15, 30, 45, 60, 75, 90, 120)
+_QUARTERS = (0, 15, 30, 45)
+
+def _time_convert_q(mins):
+    h = mins//60; r = mins%60
+    return f"Convert {mins} minutes to hours:minutes (H:M).", f"{h}:{r:02d}"
+
+def _time_add_q(h1, m1, h2, m2):
+    tot = (h1*60+m1)+(h2*60+m2)
+    return f"Add times {h1}:{m1:02d} + {h2}:{m2:02d} (H:M).", f"{tot//60}:{tot%60:02d}"
+
+def _time_read_q(h, m):
+    return f"What time is shown: {h}:{m:02d}? (Write H:M)", f"{h}:{m:02d}"
+
+def gen_time_measurement(grade, rng=random):
+    typ = rng.choice(['convert','add','read'])
+    if typ == 'convert':
+        return _time_convert_q(rng.choice(_CONVERT_MINUTES))
+    if typ == 'add':
+        h1 = rng.randint(0,3); m1 = rng.choice(_QUARTERS)
+        h2 = rng.randint(0,3); m2 = rng.choice(_QUARTERS)
+        return _time_add_q(h1, m1, h2, m2)
+    h = rng.randint(1,12); m = rng.choice(_QUARTERS)
+    return _time_read_q(h, m)
+
+def _time_measurement_space(grade, level=None):
+    return Mapped(Union(Product(_CONVERT_MINUTES), Product(range(0, 4), _QUARTERS, range(0, 4), _QUARTERS),
+                        Product(range(1, 13), _QUARTERS)),
+                  _subtypes(_time_convert_q, _time_add_q, _time_read_q))
+
+
+# ---------------------------
+# Generator registry
+# ---------------------------
+GeneratorSpec = namedtuple("GeneratorSpec", ["topic", "func", "display", "grades", "weight", "levels", "space"])
+
+_REGISTRY = {}       # topic -> GeneratorSpec
+_GRADE_TABLES = {}   # grade -> (topics, cumulative weights), rebuilt on register
+
+def _rebuild_grade_tables():
+    _GRADE_TABLES.clear()
+    for grade in GRADES:
+        specs = [s for s in _REGISTRY.values() if grade in s.grades and s.weight > 0]
+        _GRADE_TABLES[grade] = (
+            tuple(s.topic for s in specs),
+            tuple(itertools.accumulate(s.weight for s in specs)),
+        )
+
+def register_generator(topic, func, display=None, grades=GRADES, weight=1.0, space=None):
+    """
+    Register (or replace) a topic generator.
+    func(grade, rng) must return (question_text, answer) and draw all randomness
+    from rng (a random.Random or the random module) so seeded decks replay exactly;
+    display is the topic shown to players and used for weak-topic / mastery tracking.
+    A func that also takes a `level` keyword gets the level to scale its operands.
+    space(grade, level) optionally returns every (question_text, answer) func can
+    produce as an indexable sequence (see spaces.py); it enables problem_space,
+    generate_by_index and sampling without replacement for the topic.
+    """
+    levels = "level" in inspect.signature(func).parameters
+    _REGISTRY[topic] = GeneratorSpec(topic, func, display or topic, frozenset(grades), float(weight), levels, space)
+    _rebuild_grade_tables()
+    _cached_space.cache_clear()
+
+def get_generator(topic):
+    return _REGISTRY.get(topic)
+
+def run_generator(spec, grade, rng=random, level=None):
+    if level is not None and spec.levels:
+        return spec.func(grade, rng, level=level)
+    return spec.func(grade, rng)
+
+# ---------------------------
+# Problem spaces: sizes, questions by index, sampling without replacement
+# ---------------------------
+SPACE_CACHE_SIZE = 1024
+
+@functools.lru_cache(maxsize=SPACE_CACHE_SIZE)
+def _cached_space(topic, grade, level):
+    return _REGISTRY[topic].space(grade, level)
+
+def problem_space(topic, grade, level=None):
+    """
+    Every (question_text, answer) the topic can produce at this grade (and level),
+    as a read-only indexable sequence; None for generators registered without a space.
+    Operands are counted in order, so "3 + 4" and "4 + 3" are two entries.
+    """
+    spec = _REGISTRY.get(topic)
+    if spec is None or spec.space is None:
+        return None
+    return _cached_space(topic, int(grade), level if spec.levels else None)
+
+def space_size(topic, grade, level=None):
+    space = problem_space(topic, grade, level)
+    return None if space is None else len(space)
+
+def generate_by_index(topic, grade, i, level=None, choices=False):
+    """Question dict (as generate_question_for_grade) for entry i of the topic's problem space."""
+    q, a = problem_space(topic, grade, level)[i]
+    qdict = {'type':'math','topic':_REGISTRY[topic].display,'question':q,'answer':a}
+    if choices:
+        qdict['choices'] = make_choices(a, key=q)
+    return qdict
+
+def sample_topic(topic, grade, k, rng=random, level=None):
+    """Up to k distinct (question_text, answer) pairs of a topic, uniformly at random."""
+    return sample(problem_space(topic, grade, level), k, rng)
+
+def topics_for_grade(grade):
+    return _GRADE_TABLES.get(_clamp_grade(grade), ((), ()))[0]
+
+def _clamp_grade(grade):
+    return min(max(int(grade), GRADES[0]), GRADES[-1])
+
+_PRIMARY = range(2, 6)   # grades 2-5
+_MIDDLE = range(4, 9)    # grades 4-8
+_UPPER = range(9, 11)    # grades 9-10
+
+for _topic, _func, _space, _display, _grades in [
+    ('addition', gen_addition, _addition_space, 'addition', _PRIMARY),
+    ('subtraction', gen_subtraction, _subtraction_space, 'subtraction', _PRIMARY),
+    ('multiplication', gen_multiplication, _multiplication_space, 'multiplication', _PRIMARY),
+    ('division', gen_division, _division_space, 'division', _PRIMARY),
+    ('comparison', gen_comparison, _comparison_space, 'comparison', _PRIMARY),
+    ('story', gen_story, _story_space, 'story', _PRIMARY),
+    ('fractions_add', gen_fraction_add, _fraction_add_space, 'fractions', _MIDDLE),
+    ('fraction_mixed', gen_fraction_mixed, _fraction_mixed_space, 'fractions_mixed', range(4, 11)),
+    ('lcm', gen_lcm, _lcm_space, 'lcm', _MIDDLE),
+    ('hcf', gen_hcf, _hcf_space, 'hcf', _MIDDLE),
+    ('percentage', gen_percentage, _percentage_space, 'percentage', _MIDDLE),
+    ('profit', gen_profit, _profit_space, 'profit', _MIDDLE),
+    ('area_rect', gen_area_rectangle, _area_rectangle_space, 'area', _MIDDLE),
+    ('perimeter_rect', gen_perimeter_rectangle, _perimeter_rectangle_space, 'perimeter', _MIDDLE),
+    ('mul_basic', gen_multiplication, _multiplication_space, 'multiplication', _MIDDLE),
+    ('factors_multiples', gen_factors_multiples, _factors_multiples_space, 'factors_multiples', (4, 5)),
+    ('decimals', gen_decimals, _decimals_space, 'decimals', (4, 5)),
+    ('time_measurement', gen_time_measurement, _time_measurement_space, 'time', (4, 5)),
+    ('function', gen_function_eval, _function_eval_space, 'function', _UPPER),
+    ('sets', gen_set_membership, _set_membership_space, 'sets', _UPPER),
+    ('trig', gen_trig_basic, _trig_basic_space, 'trig', _UPPER),
+    ('slope', gen_slope, _slope_space, 'slope', _UPPER),
+    ('matrix', gen_matrix_add, _matrix_add_space, 'matrix', _UPPER),
+]:
+    register_generator(_topic, _func, _display, _grades, space=_space)
+
+# ---------------------------
+# Topic chooser per grade & unified generator
+# ---------------------------
+def choose_topic(grade, rng=random):
+    topics, cum = _GRADE_TABLES.get(_clamp_grade(grade), ((), ()))
+    if not topics:
+        return 'addition'
+    # same as rng.choices(topics, cum_weights=cum) without building a list
+    return topics[bisect.bisect(cum, rng.random() * cum[-1], 0, len(topics) - 1)]
+
+def generate_question_for_grade(grade, rng=random, choices=False, level=None, topic=None):
+    # topic: registry topic picked by the caller (adaptive selection), else the weighted mix
+    spec = _REGISTRY.get(topic or choose_topic(grade, rng)) or _REGISTRY['addition']
+    q,a = run_generator(spec, grade, rng, level)
+    qdict = {'type':'math','topic':spec.display,'question':q,'answer':a}
+    if choices:
+        # MCQ options (None for free-text answers); does not consume rng
+        qdict['choices'] = make_choices(a, key=q)
+    return qdict
+
+# ---------------------------
+# Shape-questions
+# ---------------------------
+_SHAPES = ('square', 'rectangle', 'circle', 'triangle')
+
+def _shape_question(shape, *dims):
+    # mistakes: the common wrong answers offered as MCQ distractors (see distractors.py)
+    if shape == 'square':
+        side, = dims
+        q = f"A square has side = {side} cm. What is its area?"
+        ans = side*side; params = {'s_px': int(side*6)}; labels = (f"{side} cm",)
+        mistakes = (4*side, 2*side)  # perimeter instead of area, side + side
+    elif shape == 'rectangle':
+        l, w = dims
+        q = f"A rectangle has length = {l} cm and width = {w} cm. What is its perimeter?"
+        ans = 2*(l+w); params = {'l_px':int(l*10),'w_px':int(w*8)}; labels = (f"{l} cm", f"{w} cm")
+        mistakes = (l*w, l+w, 2*l+w)  # area instead of perimeter, forgot to double, one width only
+    elif shape == 'circle':
+        r, = dims
+        q = f"A circle has radius = {r} cm. Approximate circumference (π≈3.14)."
+        ans = round(2*3.14*r,1); params = {'r_px':int(r*6)}; labels = (f"r = {r} cm",)
+        mistakes = (round(4*3.14*r,1), round(3.14*r*r,1), round(3.14*r,1))  # diameter as radius, area, forgot the 2
+    else:
+        b, h = dims
+        q = f"A triangle has base = {b} cm and height = {h} cm. What is its area?"
+        ans = round(0.5*b*h,1); params = {'base_px':int(b*10),'h_px':int(h*8)}; labels = (f"{b} cm", f"h = {h} cm")
+        mistakes = (float(b*h), float(b+h), round(0.5*(b+h),1))  # forgot the ½, added instead of multiplied
+    # the figure itself is rendered (once per key, process-wide) by shapes.render_shape
+    image_key = shape_key(shape, params)
+    choices = make_choices(ans, mistakes, key=q)
+    return {"type":"shape","question":q,"answer":ans,"choices":choices,"image_key":image_key,"labels":labels}
+
+def gen_shape_question(grade, rng=random, level=None):
+    shape = rng.choice(_SHAPES)
+    if shape == 'square':
+        dims = (rng.randint(3+grade, _hi(3+grade, 8+grade, level)),)
+    elif shape == 'rectangle':
+        dims = (rng.randint(4+grade, _hi(4+grade, 10+grade, level)), rng.randint(2+grade, _hi(2+grade, 6+grade, level)))
+    elif shape == 'circle':
+        dims = (rng.randint(3+grade, _hi(3+grade, 7+grade, level)),)
+    else:
+        dims = (rng.randint(4+grade, _hi(4+grade, 9+grade, level)), rng.randint(3+grade, _hi(3+grade, 8+grade, level)))
+    return _shape_question(shape, *dims)
+
+@functools.lru_cache(maxsize=SPACE_CACHE_SIZE)
+def shape_space(grade, level=None):
+    """Every Shape Challenge question dict for a grade (and level), indexable like problem_space."""
+    g = grade
+    return Mapped(Union(Product(_span(3+g, 8+g, level)), Product(_span(4+g, 10+g, level), _span(2+g, 6+g, level)),
+                        Product(_span(3+g, 7+g, level)), Product(_span(4+g, 9+g, level), _span(3+g, 8+g, level))),
+                  lambda item: _shape_question(_SHAPES[item[0]], *item[1]))
+
+# ---------------------------
+# Level decks
+# ---------------------------
+DECK_CACHE_SIZE = 512
+
+def level_seed(grade, level, mode, salt=""):
+    """Stable 64-bit seed for a level deck; salt is e.g. a date and/or class code."""
+    key = f"{grade}|{level}|{mode}|{salt}".encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big")
+
+def generate_level(grade, level, mode, n=QUESTIONS_PER_LEVEL, seed=None):
+    """
+    Build every question of a level up front (tuple of question dicts).
+    Operand ranges grow with the level (level_scale).
+    With a seed the deck is fully determined by (grade, level, mode, n, seed), cached
+    process-wide and shared between sessions, so treat it as read-only.
+    Shape figures are rendered into the PNG cache here so nothing is drawn
+    while the player is answering. No question appears twice in a deck
+    (repeats are re-drawn, see dedup.py).
+    """
+    if seed is None:
+        return _build_deck(grade, level, mode, n, random.Random())
+    return _cached_deck(grade, level, mode, n, seed)
+
+@functools.lru_cache(maxsize=DECK_CACHE_SIZE)
+def _cached_deck(grade, level, mode, n, seed):
+    return _build_deck(grade, level, mode, n, random.Random(seed))
+
+def _build_deck(grade, level, mode, n, rng):
+    seen = QuestionIndex(n)
+    deck = []
+    for _ in range(n):
+        if mode == 'Math Quiz':
+            # options only for the question that is kept, not for re-drawn repeats
+            qdict = draw_unique(lambda: generate_question_for_grade(grade, rng, level=level), seen)
+            qdict['choices'] = make_choices(qdict['answer'], key=qdict['question'])
+        else:
+            qdict = draw_unique(lambda: gen_shape_question(grade, rng, level), seen)
+            render_shape(qdict['image_key'], qdict['labels'])
+        deck.append(qdict)
+    return tuple(deck)
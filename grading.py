@@ -0,0 +1,217 @@
+# grading.py
+"""
+Math Hero — answer checking
+One normalization pipeline for every answer type the generators produce:
+- numbers (ints / decimals, also typed as "3/4"), tolerance 0.05
+- fraction answers {'fraction': '3/4', 'decimal': 0.75}: an equivalent fraction or a close decimal
+- mixed numbers "2 1/3" (must be written as a mixed number), times "H:M",
+  matrices "[[x,y],[z,w]]", yes/no, comparison signs and plain text
+grade_answer() checks one answer (used by the app); grade_batch() / grade_frame()
+check whole columns with NumPy / pandas, e.g. to re-grade the leaderboard CSV or a
+worksheet upload. No Streamlit imports; NumPy / pandas are only needed for batches.
+"""
+
+import ast
+import math
+import re
+from fractions import Fraction
+
+TOLERANCE = 0.05
+
+_INT = r"[+-]?\d+"
+_FRACTION_RE = re.compile(rf"^({_INT})\s*/\s*(\d+)$")
+_MIXED_RE = re.compile(rf"^({_INT})\s+(\d+)\s*/\s*(\d+)$")
+_TIME_RE = re.compile(r"^(\d+)\s*:\s*(\d{1,2})$")
+_MATRIX_RE = re.compile(r"^\[\s*\[.*\]\s*\]$")
+_EXPONENT_RE = re.compile(r"e([+-]?\d+)$", re.IGNORECASE)
+MAX_EXPONENT = 400  # "1e-99999999" would make Fraction build a 100-million-digit integer
+_YES = {"yes", "y", "true"}
+_NO = {"no", "n", "false"}
+
+# ---------------------------
+# Normalization
+# ---------------------------
+def parse_number(value):
+    """
+    int/float/Fraction-like input -> Fraction, else None. Accepts '3/4' and '2 1/3'.
+    Values outside the float range (inf, '1e999') are None: grading compares as floats.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, Fraction)):
+        return Fraction(value)
+    if isinstance(value, float):
+        return Fraction(value).limit_denominator(10**6) if math.isfinite(value) else None
+    s = str(value).strip()
+    if not s:
+        return None
+    try:
+        value = _parse_number_text(s)
+        if value is not None:
+            float(value)
+        return value
+    except (ValueError, ZeroDivisionError, OverflowError):
+        return None
+
+def _parse_number_text(s):
+    m = _MIXED_RE.match(s)
+    if m:
+        whole, num, den = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        frac = Fraction(num, den)
+        return whole - frac if whole < 0 else whole + frac
+    m = _FRACTION_RE.match(s)
+    if m:
+        return Fraction(int(m.group(1)), int(m.group(2)))
+    m = _EXPONENT_RE.search(s)
+    if m and abs(int(m.group(1))) > MAX_EXPONENT:
+        return None
+    return Fraction(s)
+
+def parse_time(value):
+    m = _TIME_RE.match(str(value).strip())
+    if not m or int(m.group(2)) >= 60:
+        return None
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+def parse_matrix(value):
+    s = str(value).strip()
+    if not _MATRIX_RE.match(s):
+        return None
+    try:
+        rows = ast.literal_eval(s)
+        matrix = tuple(tuple(parse_number(x) for x in row) for row in rows)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+    # an entry that isn't a number (or is out of range, e.g. 1e400) makes the whole answer unreadable
+    return None if any(x is None for row in matrix for x in row) else matrix
+
+def parse_yes_no(value):
+    s = str(value).strip().lower()
+    return "yes" if s in _YES else "no" if s in _NO else None
+
+def coerce_correct(correct):
+    """Correct answers read back from CSV arrive as strings; restore fraction dicts."""
+    if isinstance(correct, str) and correct.lstrip().startswith("{"):
+        try:
+            value = ast.literal_eval(correct)
+            if isinstance(value, dict):
+                return value
+        except (ValueError, SyntaxError):
+            pass
+    return correct
+
+def answer_kind(correct):
+    """Classify a correct answer; the given answer is normalized the same way."""
+    correct = coerce_correct(correct)
+    if isinstance(correct, dict):
+        return "fraction"
+    if isinstance(correct, (int, float)) and not isinstance(correct, bool):
+        return "number"
+    s = str(correct).strip()
+    if _MIXED_RE.match(s):
+        return "mixed"
+    if parse_time(s) is not None:
+        return "time"
+    if parse_matrix(s) is not None:
+        return "matrix"
+    if parse_yes_no(s) is not None:
+        return "yesno"
+    if parse_number(s) is not None:
+        return "number"
+    return "text"
+
+def parse_answer_input(raw):
+    """Typed input -> int / float when it is a plain number, otherwise the stripped string."""
+    if not isinstance(raw, str):
+        return raw
+    s = raw.strip()
+    if s == "":
+        return ""
+    try:
+        return float(s) if "." in s else int(s)
+    except ValueError:
+        return s
+
+# ---------------------------
+# Single answer
+# ---------------------------
+def grade_answer(given, correct, tol=TOLERANCE):
+    correct = coerce_correct(correct)
+    if given is None or (isinstance(given, str) and given.strip() == ""):
+        return False
+    kind = answer_kind(correct)
+    if kind == "fraction":
+        g = parse_number(given)
+        if g is None:
+            return False
+        exact = parse_number(correct.get("fraction"))
+        if exact is not None and g == exact:
+            return True
+        try:
+            return abs(float(g) - float(correct.get("decimal"))) <= tol
+        except (TypeError, ValueError):
+            return False
+    if kind == "number":
+        g = parse_number(given)
+        c = parse_number(correct)
+        if g is not None and c is not None:
+            return abs(float(g) - float(c)) <= tol
+    elif kind == "mixed":
+        s = str(given).strip()
+        if _MIXED_RE.match(s) or re.match(rf"^{_INT}$", s):
+            return parse_number(s) == parse_number(correct)
+        return False
+    elif kind == "time":
+        g = parse_time(given)
+        return g is not None and g == parse_time(correct)
+    elif kind == "matrix":
+        g = parse_matrix(given)
+        return g is not None and g == parse_matrix(correct)
+    elif kind == "yesno":
+        g = parse_yes_no(given)
+        return g is not None and g == parse_yes_no(correct)
+    return " ".join(str(given).lower().split()) == " ".join(str(correct).lower().split())
+
+# ---------------------------
+# Batches
+# ---------------------------
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def grade_batch(given, correct, tol=TOLERANCE):
+    """
+    Grade two equal-length sequences; returns a NumPy bool array.
+    Plain numeric pairs (the bulk of any history) are compared in one vectorized
+    step; everything else goes through grade_answer, memoized per distinct pair.
+    """
+    import numpy as np
+    given = list(given)
+    correct = [coerce_correct(c) for c in correct]
+    if len(given) != len(correct):
+        raise ValueError("given and correct must have the same length")
+    c_num = np.array([_to_float(c) if not isinstance(c, (dict, bool)) else np.nan for c in correct], dtype=float)
+    try:
+        import pandas as pd
+        g_num = pd.to_numeric(pd.Series(given, dtype=object), errors="coerce").to_numpy(dtype=float)
+    except ImportError:
+        g_num = np.array([_to_float(g) for g in given], dtype=float)
+    both = ~np.isnan(c_num) & ~np.isnan(g_num)
+    out = np.zeros(len(given), dtype=bool)
+    out[both] = np.abs(g_num[both] - c_num[both]) <= tol
+
+    memo = {}
+    for i in np.flatnonzero(~both):
+        key = (repr(given[i]), repr(correct[i]))
+        if key not in memo:
+            memo[key] = grade_answer(given[i], correct[i], tol)
+        out[i] = memo[key]
+    return out
+
+def grade_frame(df, given_col="given", correct_col="correct_answer", tol=TOLERANCE):
+    """pandas.Series of bools aligned with df (e.g. the leaderboard CSV)."""
+    import pandas as pd
+    given = df[given_col].where(df[given_col].notna(), "").tolist()
+    return pd.Series(grade_batch(given, df[correct_col].tolist(), tol), index=df.index, name="is_correct")
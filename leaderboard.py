@@ -0,0 +1,331 @@
+# leaderboard.py
+"""
+Math Hero — leaderboard
+- append_leaderboard: the raw per-question CSV log (unchanged format)
+- Leaderboard: running aggregates per (player, grade, level) and per (player, grade)
+  kept in SQLite and updated on every append, so ranking never re-reads the CSV
+- rebuild_from_csv: one-off migration that replays an existing CSV log
+- iter_leaderboard_csv: chunked (optionally filtered / gzipped) export of the CSV log
+"""
+
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from filelocks import locked
+
+LEADERBOARD_FILE = "math_hero_leaderboard.csv"
+LEADERBOARD_DB = "math_hero_leaderboard.db"
+# expected keys: timestamp, player, grade, level, q_no, question, given, correct_answer, is_correct, time_taken, percent_level
+LEADERBOARD_FIELDS = ["timestamp","player","grade","level","q_no","question","given","correct_answer","is_correct","time_taken","percent_level"]
+ALL_GRADES = 0  # grade key of the cross-grade rollup row
+
+# Append rows (list of dicts) to CSV leaderboard with consistent columns.
+# The file is locked while appending and the header decision is made under the lock
+# (empty file), so concurrent processes never interleave rows or write two headers.
+def append_leaderboard(rows, path=LEADERBOARD_FILE):
+    buf = io.StringIO(newline="")
+    writer = csv.DictWriter(buf, fieldnames=LEADERBOARD_FIELDS)
+    for r in rows:
+        writer.writerow(r)
+    try:
+        with open(path, "a", newline="", encoding="utf-8") as f, locked(f):
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS).writeheader()
+            f.write(buf.getvalue())
+            f.flush()
+        return True
+    except Exception as e:
+        print("Error writing leaderboard:", e)
+        return False
+
+# ---------------------------
+# Streaming export
+# ---------------------------
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _row_matches(row, player, grade, start, end):
+    if player is not None and row.get("player") != player:
+        return False
+    if grade is not None and _to_int(row.get("grade"), None) != int(grade):
+        return False
+    # ISO timestamps compare lexicographically; dates match on their prefix
+    ts = row.get("timestamp") or ""
+    if start is not None and ts[:len(start)] < start:
+        return False
+    if end is not None and ts[:len(end)] > end:
+        return False
+    return True
+
+def _iter_csv_chunks(path, chunk_size, player, grade, start, end):
+    if player is None and grade is None and start is None and end is None:
+        # no filter: copy the file as-is
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=LEADERBOARD_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if not _row_matches(row, player, grade, start, end):
+                continue
+            writer.writerow(row)
+            if buf.tell() >= chunk_size:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+def iter_leaderboard_csv(path=LEADERBOARD_FILE, chunk_size=EXPORT_CHUNK_SIZE, compress=False,
+                         player=None, grade=None, start=None, end=None):
+    """
+    Yield the leaderboard CSV as byte chunks, holding at most ~chunk_size in memory.
+    start/end are ISO date(time) strings, both inclusive; compress=True yields gzip.
+    """
+    if not os.path.exists(path):
+        return
+    chunks = _iter_csv_chunks(path, chunk_size, player, grade, start, end)
+    if not compress:
+        yield from chunks
+        return
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = gz.compress(chunk)
+        if out:
+            yield out
+    yield gz.flush()
+
+def write_leaderboard_export(fileobj, path=LEADERBOARD_FILE, **options):
+    """Stream an export into an open binary file; returns bytes written."""
+    written = 0
+    for chunk in iter_leaderboard_csv(path, **options):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+def _to_int(v, default=0):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return default
+
+def _to_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+class Leaderboard:
+    """
+    Aggregates:
+    - level_stats(player, grade, level): attempts, questions, total_correct,
+      best_percent, median_time
+    - player_stats(player, grade): points (sum of best_percent over levels),
+      total_correct, questions, levels_played; grade 0 rolls up all grades
+    Both are indexed by rank order, so top(n) reads n rows.
+    """
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS level_stats (
+            player TEXT NOT NULL, grade INTEGER NOT NULL, level INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0, questions INTEGER NOT NULL DEFAULT 0,
+            total_correct INTEGER NOT NULL DEFAULT 0, best_percent INTEGER NOT NULL DEFAULT 0,
+            timed INTEGER NOT NULL DEFAULT 0, median_time REAL, updated_at REAL,
+            PRIMARY KEY (player, grade, level)) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS level_stats_rank
+            ON level_stats (grade, level, best_percent DESC, median_time)""",
+        """CREATE TABLE IF NOT EXISTS level_times (
+            player TEXT NOT NULL, grade INTEGER NOT NULL, level INTEGER NOT NULL, time_taken REAL NOT NULL)""",
+        """CREATE INDEX IF NOT EXISTS level_times_key
+            ON level_times (player, grade, level, time_taken)""",
+        """CREATE TABLE IF NOT EXISTS player_stats (
+            player TEXT NOT NULL, grade INTEGER NOT NULL,
+            points INTEGER NOT NULL DEFAULT 0, total_correct INTEGER NOT NULL DEFAULT 0,
+            questions INTEGER NOT NULL DEFAULT 0, levels_played INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL,
+            PRIMARY KEY (player, grade)) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS player_stats_rank
+            ON player_stats (grade, points DESC, total_correct DESC)""",
+    ]
+
+    def __init__(self, db_path=LEADERBOARD_DB, csv_path=LEADERBOARD_FILE):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            for stmt in self.SCHEMA:
+                conn.execute(stmt)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------------------
+    # Updates
+    # ---------------------------
+    def append(self, rows):
+        """Write rows to the CSV log and fold them into the aggregates."""
+        ok = append_leaderboard(rows, self.csv_path)
+        self.record(rows)
+        return ok
+
+    def record(self, rows):
+        # group the batch by (player, grade, level) so each key is touched once
+        groups = {}
+        for r in rows:
+            key = (str(r.get("player", "Player")), _to_int(r.get("grade")), _to_int(r.get("level")))
+            g = groups.setdefault(key, {"questions": 0, "correct": 0, "attempts": 0, "best": 0, "times": []})
+            g["questions"] += 1
+            g["correct"] += 1 if _to_int(r.get("is_correct")) else 0
+            if _to_int(r.get("q_no")) == 1:
+                g["attempts"] += 1
+            g["best"] = max(g["best"], _to_int(r.get("percent_level")))
+            t = _to_float(r.get("time_taken"))
+            if t is not None:
+                g["times"].append(t)
+        if not groups:
+            return True
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                for key, g in groups.items():
+                    self._record_group(conn, key, g, now)
+            return True
+        except sqlite3.Error as e:
+            print("Error updating leaderboard:", e)
+            return False
+
+    def _record_group(self, conn, key, g, now):
+        player, grade, level = key
+        prev = conn.execute(
+            "SELECT best_percent FROM level_stats WHERE player = ? AND grade = ? AND level = ?", key
+        ).fetchone()
+        old_best = prev[0] if prev else 0
+        conn.execute(
+            """INSERT INTO level_stats (player, grade, level, attempts, questions, total_correct, best_percent, timed, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (player, grade, level) DO UPDATE SET
+                 attempts = attempts + excluded.attempts,
+                 questions = questions + excluded.questions,
+                 total_correct = total_correct + excluded.total_correct,
+                 best_percent = MAX(best_percent, excluded.best_percent),
+                 timed = timed + excluded.timed,
+                 updated_at = excluded.updated_at""",
+            (player, grade, level, g["attempts"], g["questions"], g["correct"], g["best"], len(g["times"]), now))
+        if g["times"]:
+            conn.executemany(
+                "INSERT INTO level_times (player, grade, level, time_taken) VALUES (?, ?, ?, ?)",
+                [(player, grade, level, t) for t in g["times"]])
+            conn.execute(
+                "UPDATE level_stats SET median_time = ? WHERE player = ? AND grade = ? AND level = ?",
+                (self._median_time(conn, key), player, grade, level))
+        gained = max(0, g["best"] - old_best)
+        new_level = 0 if prev else 1
+        for gr in (grade, ALL_GRADES):
+            conn.execute(
+                """INSERT INTO player_stats (player, grade, points, total_correct, questions, levels_played, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (player, grade) DO UPDATE SET
+                     points = points + excluded.points,
+                     total_correct = total_correct + excluded.total_correct,
+                     questions = questions + excluded.questions,
+                     levels_played = levels_played + excluded.levels_played,
+                     updated_at = excluded.updated_at""",
+                (player, gr, gained, g["correct"], g["questions"], new_level, now))
+
+    def _median_time(self, conn, key):
+        # walks the (player, grade, level, time_taken) index; no sort needed
+        n = conn.execute(
+            "SELECT timed FROM level_stats WHERE player = ? AND grade = ? AND level = ?", key
+        ).fetchone()[0]
+        if n <= 0:
+            return None
+        vals = [row[0] for row in conn.execute(
+            """SELECT time_taken FROM level_times WHERE player = ? AND grade = ? AND level = ?
+               ORDER BY time_taken LIMIT ? OFFSET ?""",
+            key + (2 - n % 2, (n - 1) // 2))]
+        return round(sum(vals) / len(vals), 2) if vals else None
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def top(self, n=10, grade=None, level=None):
+        """Top-n players overall, for a grade, or for a single grade+level."""
+        conn = self._conn()
+        if level is not None and grade is not None:
+            cur = conn.execute(
+                """SELECT player, best_percent, total_correct, questions, attempts, median_time
+                   FROM level_stats WHERE grade = ? AND level = ?
+                   ORDER BY best_percent DESC, median_time LIMIT ?""",
+                (int(grade), int(level), int(n)))
+            cols = ["player", "best_percent", "total_correct", "questions", "attempts", "median_time"]
+        else:
+            cur = conn.execute(
+                """SELECT player, points, total_correct, questions, levels_played
+                   FROM player_stats WHERE grade = ?
+                   ORDER BY points DESC, total_correct DESC LIMIT ?""",
+                (ALL_GRADES if grade is None else int(grade), int(n)))
+            cols = ["player", "points", "total_correct", "questions", "levels_played"]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def player_levels(self, player, grade):
+        cur = self._conn().execute(
+            """SELECT level, best_percent, total_correct, questions, attempts, median_time
+               FROM level_stats WHERE player = ? AND grade = ? ORDER BY level""",
+            (player, int(grade)))
+        cols = ["level", "best_percent", "total_correct", "questions", "attempts", "median_time"]
+        return [dict(zip(cols, row)) for row in cur]
+
+    # ---------------------------
+    # Migration
+    # ---------------------------
+    def reset(self):
+        """Drop all aggregates (the CSV log is left alone)."""
+        with self._conn() as conn:
+            for table in ("level_stats", "level_times", "player_stats"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def rebuild_from_csv(self, csv_path=None, batch_size=5000):
+        """Drop all aggregates and replay the CSV log in batches (bounded memory)."""
+        path = csv_path or self.csv_path
+        self.reset()
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        batch = []
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.record(batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            self.record(batch)
+            count += len(batch)
+        return count
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+if __name__ == "__main__":
+    import sys
+    lb = Leaderboard(csv_path=sys.argv[1] if len(sys.argv) > 1 else LEADERBOARD_FILE)
+    print(f"Rebuilt leaderboard from {lb.csv_path}: {lb.rebuild_from_csv()} rows")
@@ -0,0 +1,127 @@
+# mastery.py
+"""
+Math Hero — per-topic mastery and adaptive topic selection
+Each player has an Elo-style rating per topic (display topic, as recorded in
+answer events). Every answer is a match between the player and a question whose
+difficulty comes from the level; the rating moves by K * (score - expected), so
+an update is O(1). Fast correct answers score 1, slow correct answers a bit
+less, wrong answers 0. K shrinks as a topic collects answers, so early
+estimates move quickly and settled ones stay put.
+
+Ratings live in the session as {topic: [rating, answers]} (plain JSON) and are
+persisted per player through the progress store.
+
+choose_adaptive_topic() draws the next topic for a grade with weights peaking
+where the player's expected success at this level is TARGET_P: hard enough to
+learn from, easy enough to pass. Far weaker and fully mastered topics keep a
+floor weight, so they still come up. (Drilling the weakest topics outright
+needed more answers per passed level than the plain mix; compare with
+benchmarks/simulate_sessions.py --learners [--adaptive], keeping in mind that
+adaptive levels can also end early.) A grade has a bounded handful of topics,
+so the draw is a constant-size cumulative table plus bisect, like choose_topic.
+"""
+
+import bisect
+import math
+import random
+
+from generators import LEVELS_PER_GRADE, get_generator, topics_for_grade
+
+BASE_RATING = 1000.0
+LEVEL_STEP = 25.0       # question difficulty added per level
+K_MAX = 48.0            # update size for a topic's first answers
+K_MIN = 12.0            # ... and once it has settled
+K_HALF_LIFE = 10        # answers until K is halfway between the two
+SLOW_PENALTY = 0.3      # a correct answer at the time limit scores 1 - SLOW_PENALTY
+TARGET_P = 0.85         # expected success the selection aims for
+TARGET_WIDTH = 0.15     # how quickly the weight falls off around TARGET_P
+MIN_WEIGHT = 0.2        # selection weight floor (far off target)
+MASTERED_P = 0.8        # expected success at which a topic counts as mastered
+
+def question_difficulty(level):
+    """Rating of a level's questions: BASE_RATING mid-grade, lower before, higher after."""
+    return BASE_RATING + LEVEL_STEP * (int(level) - (LEVELS_PER_GRADE + 1) / 2)
+
+def expected_score(rating, difficulty):
+    return 1.0 / (1.0 + 10 ** ((difficulty - rating) / 400.0))
+
+def answer_score(is_correct, time_taken=None, time_limit=None):
+    if not is_correct:
+        return 0.0
+    if not time_taken or not time_limit:
+        return 1.0
+    return 1.0 - SLOW_PENALTY * min(1.0, time_taken / time_limit)
+
+def k_factor(answers):
+    return K_MIN + (K_MAX - K_MIN) * K_HALF_LIFE / (K_HALF_LIFE + answers)
+
+class Mastery:
+    """View over a session's {topic: [rating, answers]} dict (mutated in place)."""
+
+    def __init__(self, ratings=None):
+        self.ratings = {} if ratings is None else ratings
+
+    def rating(self, topic):
+        entry = self.ratings.get(topic)
+        return entry[0] if entry else BASE_RATING
+
+    def answers(self, topic):
+        entry = self.ratings.get(topic)
+        return entry[1] if entry else 0
+
+    def update(self, topic, is_correct, level, time_taken=None, time_limit=None):
+        entry = self.ratings.get(topic)
+        if entry is None:
+            entry = self.ratings[topic] = [BASE_RATING, 0]
+        expected = expected_score(entry[0], question_difficulty(level))
+        entry[0] = round(entry[0] + k_factor(entry[1]) * (answer_score(is_correct, time_taken, time_limit) - expected), 1)
+        entry[1] += 1
+        return entry[0]
+
+    def success_chance(self, topic, level):
+        return expected_score(self.rating(topic), question_difficulty(level))
+
+    def is_mastered(self, topic, level):
+        return self.success_chance(topic, level) >= MASTERED_P
+
+    def weakest(self, n=3):
+        """Lowest-rated topics with at least one answer: [(topic, rating)]."""
+        return sorted(((t, e[0]) for t, e in self.ratings.items() if e[1]), key=lambda x: x[1])[:n]
+
+    def merge(self, saved):
+        """Fold in saved ratings (e.g. from the progress store); more answers wins."""
+        for topic, entry in (saved or {}).items():
+            try:
+                rating, answers = float(entry[0]), int(entry[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if answers > self.answers(topic):
+                self.ratings[topic] = [rating, answers]
+
+def _weight(p):
+    return MIN_WEIGHT + math.exp(-((p - TARGET_P) / TARGET_WIDTH) ** 2)
+
+def topic_weight(mastery, topic, level):
+    return _weight(mastery.success_chance(topic, level))
+
+def choose_adaptive_topic(grade, mastery, level, rng=random):
+    """Registry topic for the next question, weighted towards TARGET_P success at this level."""
+    topics = topics_for_grade(grade)
+    if not topics:
+        return None
+    difficulty = question_difficulty(level)
+    by_display = {}  # registry topics can share a display topic (and so a rating)
+    cum, total = [], 0.0
+    for t in topics:
+        spec = get_generator(t)
+        w = by_display.get(spec.display)
+        if w is None:
+            w = by_display[spec.display] = _weight(expected_score(mastery.rating(spec.display), difficulty))
+        total += spec.weight * w
+        cum.append(total)
+    return topics[bisect.bisect(cum, rng.random() * total, 0, len(topics) - 1)]
+
+def grade_mastered(grade, mastery, level):
+    """True when every topic of the grade is mastered at this level."""
+    displays = {get_generator(t).display for t in topics_for_grade(grade)}
+    return bool(displays) and all(mastery.is_mastered(d, level) for d in displays)
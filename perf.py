@@ -0,0 +1,139 @@
+# perf.py
+"""
+Math Hero — per-phase latency instrumentation (opt-in)
+Set MATH_HERO_PERF=1 to time the phases of every Streamlit rerun (progress
+hydration, level selector, question generation, shape rendering, leaderboard
+reads ...). Durations are kept per phase in a rolling window for percentiles,
+plus a running count/sum, and can be written as Prometheus text exposition
+(a summary per phase) for the node_exporter textfile collector or a scrape.
+Other modules can append their own metric lines with METRICS.add_collector().
+
+When disabled, timed_fn() returns the function unchanged and timed() returns a
+shared no-op context manager, so the hooks cost one attribute lookup.
+
+    from perf import timed, timed_fn
+    @timed_fn("level_selector")
+    def render_level_selector(): ...
+    with timed("render_shape"):
+        img = render_shape(key)
+"""
+
+import contextlib
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from filelocks import atomic_write_text
+
+PERF_ENABLED = os.environ.get("MATH_HERO_PERF", "").lower() in ("1", "true", "yes", "on")
+PERF_WINDOW = int(os.environ.get("MATH_HERO_PERF_WINDOW", "1000"))  # samples kept per phase
+PERF_EXPORT_FILE = os.environ.get("MATH_HERO_PERF_EXPORT", "")  # write Prometheus text here periodically
+PERF_EXPORT_INTERVAL = 15.0  # seconds between periodic exports
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC_NAME = "math_hero_phase_seconds"
+
+_NOOP = contextlib.nullcontext()
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted sequence (q in 0..1)."""
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+class PhaseMetrics:
+    """Rolling samples per phase (shared by every session of the server process)."""
+
+    def __init__(self, window=PERF_WINDOW):
+        self.window = window
+        self._samples = {}  # phase -> deque of seconds
+        self._totals = {}   # phase -> [count, sum]
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+        self._collectors = []  # callables returning extra exposition lines
+
+    def add_collector(self, fn):
+        """Register fn() -> list of Prometheus lines (once; repeat calls are ignored)."""
+        if fn not in self._collectors:
+            self._collectors.append(fn)
+
+    def record(self, phase, seconds):
+        with self._lock:
+            samples = self._samples.get(phase)
+            if samples is None:
+                samples = self._samples[phase] = deque(maxlen=self.window)
+                self._totals[phase] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[phase]
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextlib.contextmanager
+    def time(self, phase):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - t0)
+
+    def snapshot(self):
+        """{phase: {count, sum, window, p50, p90, p99, max}} in seconds."""
+        with self._lock:
+            data = {p: (sorted(s), tuple(self._totals[p])) for p, s in self._samples.items()}
+        out = {}
+        for phase, (values, (count, total)) in sorted(data.items()):
+            row = {"count": count, "sum": total, "window": len(values), "max": values[-1] if values else None}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = percentile(values, q)
+            out[phase] = row
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def prometheus_text(self):
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent per phase of a Math Hero rerun (rolling window quantiles).",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for phase, row in self.snapshot().items():
+            label = phase.replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                value = row[f"p{int(q * 100)}"]
+                lines.append(f'{METRIC_NAME}{{phase="{label}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{phase="{label}"}} {row["sum"]:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{phase="{label}"}} {row["count"]}')
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        atomic_write_text(path, self.prometheus_text(), backup=False)
+        self._last_export = time.time()
+
+    def maybe_export(self, path=PERF_EXPORT_FILE, interval=PERF_EXPORT_INTERVAL):
+        """Write the text file at most every `interval` seconds (called once per rerun)."""
+        if path and time.time() - self._last_export >= interval:
+            self.write_prometheus(path)
+
+METRICS = PhaseMetrics()
+
+def timed(phase):
+    return METRICS.time(phase) if PERF_ENABLED else _NOOP
+
+def timed_fn(phase):
+    def decorate(fn):
+        if not PERF_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.time(phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,291 @@
+# progress_store.py
+"""
+Math Hero — progress persistence backends
+- ProgressStore: the small API the app talks to (load / save_level / save)
+- JsonProgressStore: the original single-file JSON snapshot (load_json / save_json)
+- SqliteProgressStore: one row per (player, grade, level) in a WAL-mode SQLite db,
+  so finishing a level is a row upsert and loading reads only one player's rows;
+  an existing JSON snapshot is imported once (import_json), as LEGACY_PLAYER's
+  progress: the JSON file was shared by everyone, and "Player" is the default name
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from filelocks import atomic_write_text, backup_path, lock_path
+
+SAVE_FILE = "math_hero_progress.json"
+PROGRESS_DB = "math_hero_progress.db"
+LEGACY_PLAYER = "Player"
+
+# ---------------------------
+# Utilities: JSON snapshot
+# ---------------------------
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_json(path=SAVE_FILE):
+    # a torn or missing snapshot falls back to the last good one instead of {}
+    for candidate in (path, backup_path(path)):
+        try:
+            return _read_json(candidate)
+        except FileNotFoundError:
+            continue  # missing, or mid-rename by another writer
+        except Exception:
+            print("Unreadable progress snapshot, trying backup:", candidate)
+    return {}
+
+def _write_json(data, path):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+def save_json(data, path=SAVE_FILE):
+    try:
+        with lock_path(path):
+            _write_json(data, path)
+        return True
+    except Exception:
+        return False
+
+# ---------------------------
+# Backend interface
+# ---------------------------
+class ProgressStore:
+    """
+    Progress data has the same shape as the session keys it feeds:
+    {'level_unlocked': {grade: [levels]}, 'level_progress': {grade: {level: result}},
+     'mastery': {topic: [rating, answers]}}
+    with grade/level keys as strings.
+    """
+
+    def load(self, player):
+        raise NotImplementedError
+
+    def save_level(self, player, grade, level, result, unlock=None):
+        """Persist one finished level; `unlock` is a level number to mark unlocked."""
+        raise NotImplementedError
+
+    def save(self, player, data):
+        """Persist a full snapshot (Save Progress button, legacy JSON import)."""
+        raise NotImplementedError
+
+    def save_mastery(self, player, mastery):
+        """Persist topic ratings {topic: [rating, answers]} (sent with each finished level)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class JsonProgressStore(ProgressStore):
+    """
+    The original backend: one shared JSON file for every player. Updates are a
+    locked read-modify-write with an atomic rename, so several server processes
+    can share the file.
+    """
+
+    def __init__(self, path=SAVE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, player):
+        return load_json(self.path)
+
+    def save_level(self, player, grade, level, result, unlock=None):
+        try:
+            with self._lock, lock_path(self.path):
+                data = load_json(self.path)
+                g = str(grade)
+                data.setdefault("level_progress", {}).setdefault(g, {})[str(level)] = result
+                if unlock is not None:
+                    unlocked = data.setdefault("level_unlocked", {}).setdefault(g, [1])
+                    if unlock not in unlocked:
+                        unlocked.append(unlock)
+                _write_json(data, self.path)
+            return True
+        except Exception as e:
+            print("Error saving progress:", e)
+            return False
+
+    def save(self, player, data):
+        with self._lock:
+            return save_json(data, self.path)
+
+    def save_mastery(self, player, mastery):
+        try:
+            with self._lock, lock_path(self.path):
+                data = load_json(self.path)
+                data.setdefault("mastery", {}).update(mastery)
+                _write_json(data, self.path)
+            return True
+        except Exception as e:
+            print("Error saving progress:", e)
+            return False
+
+class SqliteProgressStore(ProgressStore):
+    """Per-player rows keyed by (player, grade, level); one connection per thread."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS progress (
+        player TEXT NOT NULL,
+        grade INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        unlocked INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (player, grade, level)
+    ) WITHOUT ROWID
+    """
+
+    UPSERT_RESULT = """
+    INSERT INTO progress (player, grade, level, unlocked, result, updated_at)
+    VALUES (?, ?, ?, 1, ?, ?)
+    ON CONFLICT (player, grade, level)
+    DO UPDATE SET result = excluded.result, unlocked = 1, updated_at = excluded.updated_at
+    """
+
+    MASTERY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS mastery (
+        player TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        rating REAL NOT NULL,
+        answers INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (player, topic)
+    ) WITHOUT ROWID
+    """
+
+    UPSERT_MASTERY = """
+    INSERT INTO mastery (player, topic, rating, answers, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (player, topic)
+    DO UPDATE SET rating = excluded.rating, answers = excluded.answers, updated_at = excluded.updated_at
+    """
+
+    UPSERT_UNLOCK = """
+    INSERT INTO progress (player, grade, level, unlocked, result, updated_at)
+    VALUES (?, ?, ?, 1, NULL, ?)
+    ON CONFLICT (player, grade, level)
+    DO UPDATE SET unlocked = 1, updated_at = excluded.updated_at
+    """
+
+    META_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path=PROGRESS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(self.SCHEMA)
+            conn.execute(self.MASTERY_SCHEMA)
+            conn.execute(self.META_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, player):
+        rows = self._conn().execute(
+            "SELECT grade, level, unlocked, result FROM progress WHERE player = ?", (player,)
+        ).fetchall()
+        unlocked, progress = {}, {}
+        for grade, level, is_unlocked, result in rows:
+            g = str(grade)
+            if is_unlocked:
+                unlocked.setdefault(g, []).append(level)
+            if result is not None:
+                try:
+                    progress.setdefault(g, {})[str(level)] = json.loads(result)
+                except ValueError:
+                    pass
+        mastery = {topic: [rating, answers] for topic, rating, answers in self._conn().execute(
+            "SELECT topic, rating, answers FROM mastery WHERE player = ?", (player,))}
+        return {"level_unlocked": unlocked, "level_progress": progress, "mastery": mastery}
+
+    def save_level(self, player, grade, level, result, unlock=None):
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                conn.execute(self.UPSERT_RESULT, (player, int(grade), int(level), json.dumps(result, ensure_ascii=False), now))
+                if unlock is not None:
+                    conn.execute(self.UPSERT_UNLOCK, (player, int(grade), int(unlock), now))
+            return True
+        except sqlite3.Error as e:
+            print("Error saving progress:", e)
+            return False
+
+    def save(self, player, data):
+        try:
+            with self._conn() as conn:
+                self._save(conn, player, data, time.time())
+            return True
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print("Error saving progress:", e)
+            return False
+
+    def _save(self, conn, player, data, now):
+        for g, levels in (data.get("level_unlocked") or {}).items():
+            for lvl in levels:
+                conn.execute(self.UPSERT_UNLOCK, (player, int(g), int(lvl), now))
+        for g, obj in (data.get("level_progress") or {}).items():
+            for lvl, result in obj.items():
+                conn.execute(self.UPSERT_RESULT, (player, int(g), int(lvl), json.dumps(result, ensure_ascii=False), now))
+        self._save_mastery(conn, player, data.get("mastery") or {}, now)
+
+    def import_json(self, path=SAVE_FILE, player=LEGACY_PLAYER):
+        """
+        Import a JSON snapshot (JsonProgressStore's file) as `player`'s progress,
+        once per database: later calls, from any process, do nothing. Returns
+        whether this call imported it.
+        """
+        data = load_json(path)
+        if not data:
+            return False
+        try:
+            with self._conn() as conn:
+                if not conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('json_imported', ?)", (path,)).rowcount:
+                    return False
+                self._save(conn, player, data, time.time())
+            return True
+        except (sqlite3.Error, ValueError, TypeError, AttributeError) as e:
+            print("Error importing progress snapshot:", e)
+            return False
+
+    def save_mastery(self, player, mastery):
+        try:
+            with self._conn() as conn:
+                self._save_mastery(conn, player, mastery, time.time())
+            return True
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print("Error saving progress:", e)
+            return False
+
+    def _save_mastery(self, conn, player, mastery, now):
+        conn.executemany(self.UPSERT_MASTERY, [(player, topic, float(rating), int(answers), now)
+                                               for topic, (rating, answers) in mastery.items()])
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def open_progress_store(backend="sqlite", path=None, legacy_json=None):
+    """legacy_json: a JSON snapshot to import into a new sqlite store (see SqliteProgressStore.import_json)."""
+    if backend == "json":
+        return JsonProgressStore(path or SAVE_FILE)
+    if backend == "sqlite":
+        store = SqliteProgressStore(path or PROGRESS_DB)
+        if legacy_json:
+            store.import_json(legacy_json)
+        return store
+    raise ValueError(f"Unknown progress backend: {backend}")
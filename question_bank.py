@@ -0,0 +1,262 @@
+# question_bank.py
+"""
+Math Hero — precomputed question bank (binary file, memory-mapped)
+A bank is a fixed set of questions built once from the generators (a sample of
+each topic's problem space, plus Shape Challenge questions), reviewed as CSV and
+shipped with a classroom deployment. QuestionBank opens it read-only with mmap,
+so every worker process on the machine shares one page-cache copy; only the
+small section table is read up front, and a question is found by
+(grade, topic, index) with two fixed-width lookups and slices of the string table.
+
+File layout (little-endian):
+  header    magic "MHQB", version, section count, record count, offsets
+  sections  grade, level (0 = the grade's base ranges), topic, display topic,
+            first record, record count
+  records   (offset, length) into the string table of the question text, the
+            answer (JSON) and the extras (JSON: MCQ choices, shape figure)
+  strings   UTF-8; identical strings are stored once
+
+    python question_bank.py build --out bank.mhqb [--grades 4 5] [-n 200] [--levels 1 10 20] [--seed 1]
+    python question_bank.py dump bank.mhqb [--grades 4] [--topics trig shapes] > review.csv
+    python question_bank.py info bank.mhqb
+
+Set MATH_HERO_QUESTION_BANK=bank.mhqb and the app / API serve every question
+(level decks included) from the bank instead of generating it.
+"""
+
+import argparse
+import bisect
+import csv
+import functools
+import json
+import mmap
+import random
+import struct
+import sys
+
+from dedup import QuestionIndex, draw_unique
+from distractors import make_choices
+from filelocks import atomic_write_bytes
+from generators import DECK_CACHE_SIZE, GRADES, LEVELS_PER_GRADE, choose_topic, get_generator, problem_space, shape_space, topics_for_grade
+from shapes import render_shape
+from spaces import sample
+
+MAGIC = b"MHQB"
+VERSION = 1
+SHAPES = "shapes"  # topic name of the Shape Challenge sections
+HEADER = struct.Struct("<4sHHIIQQ")    # magic, version, reserved, sections, records, records at, strings at
+SECTION = struct.Struct("<HHIIIIII")   # grade, level, topic (off, len), display (off, len), first record, count
+RECORD = struct.Struct("<IIIIII")      # question, answer, extras: (off, len) each
+
+class QuestionBank:
+    """Read-only view of a bank file; share one instance per process (open_bank)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n_sections, self.records, self._records_at, self._strings_at = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path}: not a version {VERSION} Math Hero question bank")
+        self._sections = {}  # (grade, topic, level) -> (display, first, count)
+        self._levels = {}    # (grade, topic) -> sorted levels present
+        for k in range(n_sections):
+            grade, level, t_off, t_len, d_off, d_len, first, count = SECTION.unpack_from(self._mm, HEADER.size + k * SECTION.size)
+            topic = self._str(t_off, t_len)
+            self._sections[(grade, topic, level)] = (self._str(d_off, d_len), first, count)
+            bisect.insort(self._levels.setdefault((grade, topic), []), level)
+        # seeded decks are shared by every session of the process, like generators.generate_level
+        self.seeded_deck = functools.lru_cache(maxsize=DECK_CACHE_SIZE)(self._seeded_deck)
+
+    def close(self):
+        self._mm.close()
+
+    def _str(self, off, length):
+        start = self._strings_at + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _section(self, grade, topic, level=None):
+        # the bank's level closest below the asked one, so operands are never bigger than asked;
+        # None when every bank level is above it (the engine then generates)
+        levels = self._levels.get((int(grade), topic))
+        k = bisect.bisect_right(levels, level or 0) if levels else 0
+        return self._sections[(int(grade), topic, levels[k - 1])] if k else None
+
+    def topics(self, grade):
+        return sorted({t for g, t in self._levels if g == int(grade)})
+
+    def has(self, grade, mode="Math Quiz", level=None):
+        """Whether the bank can serve this grade (at this level) in this mode."""
+        if mode != "Math Quiz":
+            return self.count(grade, SHAPES, level) > 0
+        return any(self.count(grade, t, level) for t in self.topics(grade) if t != SHAPES)
+
+    def count(self, grade, topic, level=None):
+        section = self._section(grade, topic, level)
+        return section[2] if section else 0
+
+    def question(self, grade, topic, i, level=None):
+        """Question dict (as the generators return it) for entry i of a section."""
+        display, first, count = self._section(grade, topic, level)
+        if not 0 <= i < count:
+            raise IndexError(f"{topic} grade {grade}: index {i} out of range ({count} questions)")
+        q_off, q_len, a_off, a_len, x_off, x_len = RECORD.unpack_from(self._mm, self._records_at + (first + i) * RECORD.size)
+        q = self._str(q_off, q_len)
+        extras = json.loads(self._str(x_off, x_len))
+        if topic == SHAPES:
+            shape, params, size = extras["image_key"]
+            return {"type": "shape", "question": q, "answer": json.loads(self._str(a_off, a_len)),
+                    "choices": extras.get("choices"), "image_key": (shape, tuple(map(tuple, params)), size),
+                    "labels": tuple(extras["labels"])}
+        qdict = {"type": "math", "topic": display, "question": q, "answer": json.loads(self._str(a_off, a_len))}
+        if "choices" in extras:
+            qdict["choices"] = extras["choices"]
+        return qdict
+
+    def draw(self, grade, rng=random, level=None, mode="Math Quiz", topic=None):
+        """
+        A random question for a grade: Shape Challenge from the shapes section,
+        Math Quiz from `topic` (registry name) or the game's topic mix. Topics the
+        bank lacks are replaced by one it has; None when it has nothing for the grade.
+        """
+        if mode != "Math Quiz":
+            topic = SHAPES
+        elif not (topic and self.count(grade, topic, level)):
+            topic = choose_topic(grade, rng)
+            if not self.count(grade, topic, level):
+                topics = [t for t in self.topics(grade) if t != SHAPES and self.count(grade, t, level)]
+                if not topics:
+                    return None
+                topic = rng.choice(topics)
+        n = self.count(grade, topic, level)
+        return self.question(grade, topic, rng.randrange(n), level) if n else None
+
+    def deck(self, grade, level, mode, n, rng):
+        """A level deck like generators.generate_level, drawn from the bank; None when it has nothing for the grade."""
+        if not self.has(grade, mode, level):
+            return None
+        seen = QuestionIndex(n)
+        deck = tuple(draw_unique(lambda: self.draw(grade, rng, level, mode), seen) for _ in range(n))
+        if mode != "Math Quiz":
+            for qdict in deck:
+                render_shape(qdict["image_key"], qdict["labels"])
+        return deck
+
+    def _seeded_deck(self, grade, level, mode, n, seed):
+        return self.deck(grade, level, mode, n, random.Random(seed))
+
+    def __iter__(self):
+        """(grade, topic, level, question dict) for every question, section by section."""
+        for (grade, topic, level) in sorted(self._sections):
+            for i in range(self._sections[(grade, topic, level)][2]):
+                yield grade, topic, level, self.question(grade, topic, i, level)
+
+@functools.lru_cache(maxsize=None)
+def open_bank(path):
+    """One mapping per process and path."""
+    return QuestionBank(path)
+
+# ---------------------------
+# Building
+# ---------------------------
+def _pick(grade, topic, level, n, rng):
+    if topic == SHAPES:
+        return [(q["question"], q["answer"], {"choices": q["choices"], "image_key": q["image_key"], "labels": q["labels"]})
+                for q in sample(shape_space(grade, level), n, rng)]
+    space = problem_space(topic, grade, level)
+    if space is None:
+        return []
+    out = []
+    for q, a in sample(space, n, rng):
+        choices = make_choices(a, key=q)
+        out.append((q, a, {"choices": choices} if choices is not None else {}))
+    return out
+
+def build_bank(path, grades=GRADES, topics=None, n=200, levels=(None,), seed=None):
+    """
+    Write a bank with up to n distinct questions per grade, topic and level
+    (every question when the topic has fewer). topics: registry topics and/or
+    "shapes" (default: all of each grade's topics plus shapes); level None is the
+    grade's base ranges. Returns the number of questions written.
+    """
+    strings, blob = {}, bytearray()
+
+    def ref(text):
+        hit = strings.get(text)
+        if hit is None:
+            data = text.encode("utf-8")
+            hit = strings[text] = (len(blob), len(data))
+            blob.extend(data)
+        return hit
+
+    sections, records = bytearray(), bytearray()
+    n_sections = n_records = 0
+    for grade in grades:
+        rng = random.Random(f"{seed}|{grade}") if seed is not None else random.Random()
+        for topic in (topics or list(topics_for_grade(grade)) + [SHAPES]):
+            if topic != SHAPES and topic not in topics_for_grade(grade):
+                continue
+            display = SHAPES if topic == SHAPES else get_generator(topic).display
+            for level in levels:
+                picked = _pick(grade, topic, level, n, rng)
+                if not picked:
+                    continue
+                sections += SECTION.pack(grade, level or 0, *ref(topic), *ref(display), n_records, len(picked))
+                for q, a, extras in picked:
+                    records += RECORD.pack(*ref(q), *ref(json.dumps(a)), *ref(json.dumps(extras, ensure_ascii=False)))
+                n_sections += 1
+                n_records += len(picked)
+    records_at = HEADER.size + len(sections)
+    header = HEADER.pack(MAGIC, VERSION, 0, n_sections, n_records, records_at, records_at + len(records))
+    atomic_write_bytes(path, bytes(header + sections + records + blob), backup=False)
+    return n_records
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build and inspect Math Hero question bank files.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="generate a bank file")
+    b.add_argument("--out", required=True)
+    b.add_argument("--grades", type=int, nargs="+", default=list(GRADES))
+    b.add_argument("--topics", nargs="+", help="registry topics and/or 'shapes' (default: all)")
+    b.add_argument("-n", type=int, default=200, help="questions per grade, topic and level")
+    b.add_argument("--levels", type=int, nargs="+", help=f"levels 1-{LEVELS_PER_GRADE} to size operands for (default: base ranges)")
+    b.add_argument("--seed", help="make the bank reproducible")
+    d = sub.add_parser("dump", help="write a bank as CSV for review")
+    d.add_argument("bank")
+    d.add_argument("--grades", type=int, nargs="+")
+    d.add_argument("--topics", nargs="+")
+    i = sub.add_parser("info", help="questions per grade / topic / level")
+    i.add_argument("bank")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        bad = [g for g in args.grades if g not in GRADES]
+        if bad:
+            ap.error(f"grades must be in {GRADES[0]}-{GRADES[-1]}: {bad}")
+        if args.levels and not all(1 <= lvl <= LEVELS_PER_GRADE for lvl in args.levels):
+            ap.error(f"--levels must be in 1-{LEVELS_PER_GRADE}")
+        written = build_bank(args.out, args.grades, args.topics, args.n, args.levels or (None,), args.seed)
+        print(f"Wrote {written} questions to {args.out}", file=sys.stderr)
+        return
+    bank = QuestionBank(args.bank)
+    try:
+        if args.cmd == "info":
+            for (grade, topic, level), (display, _, count) in sorted(bank._sections.items()):
+                print(f"grade {grade}\t{topic}\tlevel {level or 'base'}\t{count}")
+            return
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["grade", "topic", "level", "question", "answer", "choices"])
+        for grade, topic, level, q in bank:
+            if (args.grades and grade not in args.grades) or (args.topics and topic not in args.topics):
+                continue
+            writer.writerow([grade, topic, level or "", q["question"], json.dumps(q["answer"], ensure_ascii=False),
+                             " | ".join(map(str, q.get("choices") or ()))])
+    finally:
+        bank.close()
+
+if __name__ == "__main__":
+    main()
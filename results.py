@@ -0,0 +1,140 @@
+# results.py
+"""
+Math Hero — compact per-level results
+LevelResult keeps one level's answers in packed arrays (correctness, time taken,
+answer time) and holds question text / correct answers by reference to the
+question dicts of the level deck instead of copying them, so a played level
+costs a few hundred bytes. details() expands it for the result table and the
+leaderboard; summary() is what gets stored in level_progress.
+LevelSet and pack_progress keep the rest of a session small: unlocked levels
+as a bitmask, and grades other than the current one as one byte per level.
+"""
+
+from array import array
+from datetime import datetime
+
+class LevelResult:
+    __slots__ = ("grade", "level", "seed", "pass_percent", "questions", "given", "is_correct", "time_taken", "answered_at")
+
+    NO_TIME = -1.0  # time_taken sentinel for "unknown"
+
+    def __init__(self, grade, level, seed=None, pass_percent=70):
+        self.grade = grade
+        self.level = level
+        self.seed = seed
+        self.pass_percent = pass_percent
+        self.questions = []          # references to the deck's question dicts
+        self.given = []              # raw answers as submitted
+        self.is_correct = array("B")
+        self.time_taken = array("f")
+        self.answered_at = array("d")  # unix time
+
+    def __len__(self):
+        return len(self.is_correct)
+
+    def add(self, qdict, given, is_correct, time_taken, answered_at):
+        self.questions.append(qdict)
+        self.given.append(given)
+        self.is_correct.append(1 if is_correct else 0)
+        self.time_taken.append(self.NO_TIME if time_taken is None else time_taken)
+        self.answered_at.append(answered_at)
+
+    @property
+    def correct(self):
+        return sum(self.is_correct)
+
+    @property
+    def percent(self):
+        total = len(self)
+        return int(self.correct/total*100) if total > 0 else 0
+
+    @property
+    def passed(self):
+        return self.percent >= self.pass_percent
+
+    def detail(self, i):
+        q = self.questions[i]
+        t = self.time_taken[i]
+        return {
+            "q_no": i + 1,
+            "question": q.get('question', ''),
+            "given": self.given[i],
+            "correct_answer": q.get('answer'),
+            "is_correct": bool(self.is_correct[i]),
+            "time_taken": None if t == self.NO_TIME else round(t, 2),
+            "topic": q.get('topic'),
+            "timestamp": datetime.utcfromtimestamp(self.answered_at[i]).isoformat(),
+        }
+
+    def details(self):
+        return [self.detail(i) for i in range(len(self))]
+
+    def summary(self):
+        times = [t for t in self.time_taken if t != self.NO_TIME]
+        return {
+            "total": len(self),
+            "correct": self.correct,
+            "percent": self.percent,
+            "passed": self.passed,
+            "seed": self.seed,
+            "avg_time": round(sum(times)/len(times), 2) if times else None,
+            "played_at": datetime.utcfromtimestamp(self.answered_at[-1]).isoformat() if len(self) else None,
+        }
+
+    def to_dict(self, with_details=False):
+        out = self.summary()
+        if with_details:
+            out["details"] = self.details()
+        return out
+
+class LevelSet:
+    """A grade's unlocked levels as an int bitmask; supports what the app does with a set (in, iteration, add, update)."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, levels=()):
+        self.bits = 0
+        self.update(levels)
+
+    def add(self, level):
+        self.bits |= 1 << int(level)
+
+    def update(self, levels):
+        for level in levels:
+            self.add(level)
+
+    def __contains__(self, level):
+        try:
+            return bool(self.bits >> int(level) & 1)
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        bits, level = self.bits, 0
+        while bits:
+            if bits & 1:
+                yield level
+            bits >>= 1
+            level += 1
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __eq__(self, other):
+        return set(self) == set(other)
+
+    def __repr__(self):
+        return "{" + ", ".join(map(str, self)) + "}"
+
+# ---------------------------
+# Packed level summaries (grades the player isn't on)
+# ---------------------------
+def pack_progress(levels):
+    """{level: summary} -> bytes, one per level: 0 = not played, else 1 + percent, high bit when passed."""
+    out = bytearray(max((int(lvl) for lvl in levels), default=0))
+    for lvl, summary in levels.items():
+        out[int(lvl) - 1] = (1 + min(100, max(0, int(summary.get("percent") or 0)))) | (0x80 if summary.get("passed") else 0)
+    return bytes(out)
+
+def unpack_progress(packed):
+    return {str(i + 1): {"percent": (b & 0x7F) - 1, "passed": bool(b & 0x80)} for i, b in enumerate(packed) if b}
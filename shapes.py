@@ -0,0 +1,124 @@
+# shapes.py
+"""
+Math Hero — shape figures for Shape Challenge
+- draw_shape_image: PIL rendering of square / rectangle / circle / triangle
+- shape_svg: the same figures as a small SVG document, optionally with the
+  dimensions written on them (no rasterizing, the browser scales it)
+- shape_key / render_shape_png / render_shape_svg: process-wide LRU of rendered
+  figures; sessions keep only the small hashable key
+- render_shape: picks the configured renderer (SHAPE_RENDERER); the PIL path stays
+  available as "png" and falls back to SVG when Pillow is missing
+PIL is imported on first PNG render only.
+"""
+
+import functools
+import io
+import os
+
+# "svg" (default) or "png"; png needs Pillow
+SHAPE_RENDERER = os.environ.get("MATH_HERO_SHAPE_RENDERER", "svg")
+# write dimensions on SVG figures ("0" to turn off)
+SHAPE_LABELS = os.environ.get("MATH_HERO_SHAPE_LABELS", "1") != "0"
+
+# ---------------------------
+# Drawing (PIL)
+# ---------------------------
+def draw_shape_image(shape, params, size=360):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGBA", (size,size), (255,255,255,255))
+    draw = ImageDraw.Draw(img)
+    if shape == 'square':
+        s = params.get('s_px', 120)
+        x0 = (size - s)//2; y0 = (size - s)//2
+        draw.rectangle([x0,y0,x0+s,y0+s], outline="black", width=4)
+    elif shape == 'rectangle':
+        l = params.get('l_px', 160); w = params.get('w_px', 100)
+        x0 = (size - l)//2; y0 = (size - w)//2
+        draw.rectangle([x0,y0,x0+l,y0+w], outline="black", width=4)
+    elif shape == 'circle':
+        r = params.get('r_px', 70); cx = size//2; cy = size//2
+        draw.ellipse([cx-r, cy-r, cx+r, cy+r], outline="black", width=4)
+    else:  # triangle
+        base = params.get('base_px',160); h = params.get('h_px',120); cx = size//2
+        pts = [(cx, (size-h)//2), (cx-base//2, (size+h)//2), (cx+base//2, (size+h)//2)]
+        draw.polygon(pts, outline="black")
+    return img
+
+def png_bytes(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+# ---------------------------
+# Drawing (SVG)
+# ---------------------------
+_SVG_TEXT = '<text x="{x}" y="{y}" font-family="Arial, sans-serif" font-size="16" text-anchor="{anchor}">{text}</text>'
+_SVG_DASH = '<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="#6b7280" stroke-width="2" stroke-dasharray="6 4"/>'
+
+def shape_svg(shape, params, size=360, labels=()):
+    """
+    Same geometry as draw_shape_image. labels are the dimension captions, e.g.
+    ("6 cm",) for a square side, (length, width) for a rectangle, (radius,) for a
+    circle and (base, height) for a triangle.
+    """
+    parts = []
+    text = lambda x, y, t, anchor="middle": parts.append(_SVG_TEXT.format(x=x, y=y, text=t, anchor=anchor))
+    if shape == 'square':
+        s = params.get('s_px', 120)
+        x0 = (size - s)//2; y0 = (size - s)//2
+        parts.append(f'<rect x="{x0}" y="{y0}" width="{s}" height="{s}" fill="none" stroke="black" stroke-width="4"/>')
+        if labels:
+            text(size//2, y0 + s + 24, labels[0])
+    elif shape == 'rectangle':
+        l = params.get('l_px', 160); w = params.get('w_px', 100)
+        x0 = (size - l)//2; y0 = (size - w)//2
+        parts.append(f'<rect x="{x0}" y="{y0}" width="{l}" height="{w}" fill="none" stroke="black" stroke-width="4"/>')
+        if len(labels) > 0:
+            text(size//2, y0 + w + 24, labels[0])
+        if len(labels) > 1:
+            text(x0 + l + 8, size//2 + 6, labels[1], "start")
+    elif shape == 'circle':
+        r = params.get('r_px', 70); cx = size//2; cy = size//2
+        parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="none" stroke="black" stroke-width="4"/>')
+        if labels:
+            parts.append(_SVG_DASH.format(x1=cx, y1=cy, x2=cx + r, y2=cy))
+            text(cx + r//2, cy - 8, labels[0])
+    else:  # triangle
+        base = params.get('base_px',160); h = params.get('h_px',120); cx = size//2
+        top, bottom = (size-h)//2, (size+h)//2
+        pts = f"{cx},{top} {cx-base//2},{bottom} {cx+base//2},{bottom}"
+        parts.append(f'<polygon points="{pts}" fill="none" stroke="black" stroke-width="2"/>')
+        if len(labels) > 0:
+            text(cx, bottom + 24, labels[0])
+        if len(labels) > 1:
+            parts.append(_SVG_DASH.format(x1=cx, y1=top, x2=cx, y2=bottom))
+            text(cx + 8, (top + bottom)//2, labels[1], "start")
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{size}" height="{size}">'
+            f'<rect width="{size}" height="{size}" fill="white"/>' + "".join(parts) + '</svg>')
+
+# ---------------------------
+# Rendered figure cache
+# ---------------------------
+SHAPE_CACHE_SIZE = 512  # shapes x a few dozen pixel sizes fits comfortably
+
+def shape_key(shape, params, size=360):
+    return (shape, tuple(sorted(params.items())), size)
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def render_shape_png(key):
+    shape, params, size = key
+    return png_bytes(draw_shape_image(shape, dict(params), size))
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def render_shape_svg(key, labels=()):
+    shape, params, size = key
+    return shape_svg(shape, dict(params), size, labels)
+
+def render_shape(key, labels=(), renderer=None):
+    """PNG bytes or an SVG string, whichever renderer is configured."""
+    if (renderer or SHAPE_RENDERER) == "png":
+        try:
+            return render_shape_png(key)
+        except ImportError:
+            pass  # no Pillow: fall through to SVG
+    return render_shape_svg(key, tuple(labels) if SHAPE_LABELS else ())
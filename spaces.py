@@ -0,0 +1,155 @@
+# spaces.py
+"""
+Math Hero — index-addressable problem spaces
+A space is any sequence-like object (len() + [i]) over a generator's parameter
+combinations; range and tuple already qualify. The classes here compose them:
+- Product: every combination of independent axes (mixed-radix digits of i)
+- Dependent: an outer axis whose inner axis depends on it (b in 1..a);
+  cumulative sizes + bisect, so O(log) in the length of the outer axis
+- Union: question subtypes side by side; item is (part number, part item)
+- Combinations: k-subsets of a sequence, in lexicographic order (combinatorial
+  number system)
+- Mapped: items passed through a function (parameters -> (question, answer))
+IndexSampler draws distinct indices of a space in random order (lazy
+Fisher–Yates), O(1) per draw and memory proportional to the draws so far.
+"""
+
+import bisect
+import itertools
+import math
+import random
+
+class Space:
+    def __len__(self):
+        raise NotImplementedError
+
+    def __getitem__(self, i):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def _index(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"index {i} out of range for space of size {n}")
+        return i
+
+class Product(Space):
+    """Tuples (a0, a1, ...) with ai from axes[i]; the last axis varies fastest."""
+
+    def __init__(self, *axes):
+        self.axes = axes
+        self._size = math.prod(len(a) for a in axes)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        out = []
+        for axis in reversed(self.axes):
+            i, r = divmod(i, len(axis))
+            out.append(axis[r])
+        return tuple(reversed(out))
+
+class Dependent(Space):
+    """Pairs (o, x) with o from outer and x from inner(o)."""
+
+    def __init__(self, outer, inner):
+        self.outer = outer
+        self.inner = inner
+        self._cum = tuple(itertools.accumulate(len(inner(o)) for o in outer))
+
+    def __len__(self):
+        return self._cum[-1] if self._cum else 0
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        k = bisect.bisect_right(self._cum, i)
+        o = self.outer[k]
+        return o, self.inner(o)[i - (self._cum[k - 1] if k else 0)]
+
+class Union(Space):
+    """(part number, item) over the parts in order."""
+
+    def __init__(self, *parts):
+        self.parts = parts
+        self._cum = tuple(itertools.accumulate(len(p) for p in parts))
+
+    def __len__(self):
+        return self._cum[-1] if self._cum else 0
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        k = bisect.bisect_right(self._cum, i)
+        return k, self.parts[k][i - (self._cum[k - 1] if k else 0)]
+
+class Combinations(Space):
+    """k-element tuples of items (ascending positions), lexicographic like itertools.combinations."""
+
+    def __init__(self, items, k):
+        self.items = tuple(items)
+        self.k = k
+        self._size = math.comb(len(self.items), k)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        n, k = len(self.items), self.k
+        out, start = [], 0
+        for left in range(k, 0, -1):
+            # skip whole blocks of combinations that start before the next chosen item
+            while True:
+                block = math.comb(n - start - 1, left - 1)
+                if i < block:
+                    break
+                i -= block
+                start += 1
+            out.append(self.items[start])
+            start += 1
+        return tuple(out)
+
+class Mapped(Space):
+    def __init__(self, space, fn):
+        self.space = space
+        self.fn = fn
+
+    def __len__(self):
+        return len(self.space)
+
+    def __getitem__(self, i):
+        return self.fn(self.space[i])
+
+class IndexSampler:
+    """Distinct random indices in range(size): a Fisher–Yates shuffle done one draw at a time."""
+
+    def __init__(self, size, rng=random):
+        self.size = size
+        self.remaining = size
+        self.rng = rng
+        self._moved = {}  # position -> index swapped into it
+
+    def __len__(self):
+        return self.remaining
+
+    def draw(self):
+        if not self.remaining:
+            raise IndexError("every index has been drawn")
+        j = self.rng.randrange(self.remaining)
+        self.remaining -= 1
+        last = self._moved.pop(self.remaining, self.remaining)
+        if j == self.remaining:
+            return last
+        picked = self._moved.get(j, j)
+        self._moved[j] = last
+        return picked
+
+def sample(space, k, rng=random):
+    """Up to k distinct items of space in random order (all of them if it is smaller)."""
+    sampler = IndexSampler(len(space), rng)
+    return [space[sampler.draw()] for _ in range(min(k, len(space)))]
@@ -0,0 +1,202 @@
+# worksheet.py
+"""
+Math Hero — printable worksheet generator (headless, no Streamlit)
+Builds practice sheets with answer keys from the same generators the game uses.
+Grades are generated in parallel (one process per grade), questions are
+deduplicated within a sheet, and output goes to CSV, JSON or PDF.
+
+    python worksheet.py --grades 4 5 -n 40 --format pdf --out sheet.pdf
+    python worksheet.py --grades 9 --topics trig slope matrix -n 10 --format csv
+    python worksheet.py -n 1000 --format json --out bank.json --seed 7
+
+Without --topics each grade gets a mixed sheet drawn with choose_topic (same mix
+as the game); with --topics each listed topic gets -n questions ("shapes" adds
+Shape Challenge questions), sampled without repeats from the topic's problem
+space. Small topics may yield fewer unique questions than asked for; the
+shortfall is reported on stderr. --level sizes the operands like that level of
+the game (default: the grade's base ranges).
+
+For QA, --sizes prints how many distinct questions each topic can produce and
+--all writes every question of the --topics instead of a sample:
+
+    python worksheet.py --grades 4 5 --sizes
+    python worksheet.py --grades 9 --topics trig slope --all --format csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from generators import (GRADES, LEVELS_PER_GRADE, choose_topic, gen_shape_question, get_generator, problem_space,
+                        run_generator, shape_space, topics_for_grade)
+from spaces import Mapped, sample
+
+FIELDS = ["grade", "topic", "no", "question", "answer"]
+MAX_TRIES_PER_QUESTION = 50  # re-draws allowed per wanted question before giving up on duplicates
+
+def format_answer(answer):
+    if isinstance(answer, dict):
+        return f"{answer.get('fraction')} (≈ {answer.get('decimal')})"
+    return str(answer)
+
+def _draw(grade, topic, rng, level=None):
+    if topic == "shapes":
+        q = gen_shape_question(grade, rng, level)
+        return "shapes", q["question"], q["answer"]
+    if topic is None:
+        topic = choose_topic(grade, rng)
+    spec = get_generator(topic)
+    question, answer = run_generator(spec, grade, rng, level)
+    return spec.display, question, answer
+
+def _space(grade, topic, level=None):
+    # (display topic, every question of the topic as (question, answer)), or None without a problem space
+    if topic == "shapes":
+        return "shapes", Mapped(shape_space(grade, level), lambda q: (q["question"], q["answer"]))
+    space = problem_space(topic, grade, level)
+    return None if space is None else (get_generator(topic).display, space)
+
+def build_grade(grade, topics, n, seed, level=None):
+    """
+    All questions for one grade: list of row dicts plus {topic: shortfall}.
+    n=None takes every question of each topic, in problem-space order.
+    """
+    rng = random.Random(f"{seed}|{grade}") if seed is not None else random.Random()
+    rows, shortfall = [], {}
+    for topic in (topics or [None]):
+        if topic not in (None, "shapes") and topic not in topics_for_grade(grade):
+            continue
+        found = _space(grade, topic, level) if topic else None
+        if found is not None:
+            display, space = found
+            picked = list(space) if n is None else sample(space, n, rng)
+            rows.extend({"grade": grade, "topic": display, "no": i, "question": q, "answer": format_answer(a)}
+                        for i, (q, a) in enumerate(picked, 1))
+            if n is not None and len(picked) < n:
+                shortfall[topic] = n - len(picked)
+            continue
+        seen, got, tries = set(), 0, 0
+        while got < n and tries < n * MAX_TRIES_PER_QUESTION:
+            tries += 1
+            display, question, answer = _draw(grade, topic, rng, level)
+            if question in seen:
+                continue
+            seen.add(question)
+            got += 1
+            rows.append({"grade": grade, "topic": display, "no": got, "question": question, "answer": format_answer(answer)})
+        if got < n:
+            shortfall[topic or "mixed"] = n - got
+    return rows, shortfall
+
+def generate_sheet(grades, topics=None, n=20, seed=None, workers=None, level=None):
+    grades = list(grades)
+    if workers == 1 or len(grades) == 1:
+        results = [build_grade(g, topics, n, seed, level) for g in grades]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build_grade, grades, [topics] * len(grades), [n] * len(grades), [seed] * len(grades),
+                                    [level] * len(grades)))
+    rows, shortfall = [], {}
+    for g, (grade_rows, short) in zip(grades, results):
+        rows.extend(grade_rows)
+        for topic, missing in short.items():
+            shortfall[f"grade {g} / {topic}"] = missing
+    return rows, shortfall
+
+# ---------------------------
+# Writers
+# ---------------------------
+def write_csv(rows, out):
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+def write_json(rows, out):
+    json.dump(rows, out, ensure_ascii=False, indent=2)
+
+def write_pdf(rows, path, title="Math Hero Worksheet", per_page=25):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    def pages(heading, lines):
+        for start in range(0, max(len(lines), 1), per_page):
+            fig = plt.figure(figsize=(8.27, 11.69))  # A4 portrait
+            fig.text(0.08, 0.95, heading, fontsize=16, weight="bold")
+            for i, line in enumerate(lines[start:start + per_page]):
+                fig.text(0.08, 0.90 - i * 0.034, line, fontsize=10, wrap=True)
+            yield fig
+
+    with PdfPages(path) as pdf:
+        by_grade = {}
+        for r in rows:
+            by_grade.setdefault(r["grade"], []).append(r)
+        for grade, grade_rows in by_grade.items():
+            questions = [f"{i}. {r['question']}   ______" for i, r in enumerate(grade_rows, 1)]
+            answers = [f"{i}. {r['answer']}" for i, r in enumerate(grade_rows, 1)]
+            for heading, lines in ((f"{title} — Grade {grade}", questions), (f"Answer Key — Grade {grade}", answers)):
+                for fig in pages(heading, lines):
+                    pdf.savefig(fig)
+                    plt.close(fig)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate printable Math Hero worksheets with answer keys.")
+    ap.add_argument("--grades", type=int, nargs="+", default=list(GRADES))
+    ap.add_argument("--topics", nargs="+", help="registry topics (see generators.topics_for_grade) or 'shapes'")
+    ap.add_argument("-n", type=int, default=20, help="questions per grade (or per topic with --topics)")
+    ap.add_argument("--format", choices=["csv", "json", "pdf"], default="csv")
+    ap.add_argument("--out", help="output file (default stdout; required for pdf)")
+    ap.add_argument("--seed", help="make the sheet reproducible")
+    ap.add_argument("--level", type=int, help=f"scale operand ranges like level 1-{LEVELS_PER_GRADE} of the game")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    ap.add_argument("--sizes", action="store_true", help="print the number of distinct questions per topic and exit")
+    ap.add_argument("--all", action="store_true", help="every question of each --topics topic instead of -n")
+    args = ap.parse_args(argv)
+
+    bad = [g for g in args.grades if g not in GRADES]
+    if bad:
+        ap.error(f"grades must be in {GRADES[0]}-{GRADES[-1]}: {bad}")
+    if args.format == "pdf" and not args.out:
+        ap.error("--out is required for pdf")
+
+    if args.level is not None and not 1 <= args.level <= LEVELS_PER_GRADE:
+        ap.error(f"--level must be in 1-{LEVELS_PER_GRADE}")
+    if args.all and not args.topics:
+        ap.error("--all needs --topics")
+    unknown = [t for t in args.topics or () if t != "shapes" and get_generator(t) is None]
+    if unknown:
+        ap.error(f"unknown topics: {unknown} (see generators.topics_for_grade)")
+    if args.sizes:
+        for g in args.grades:
+            for topic in (args.topics or list(topics_for_grade(g)) + ["shapes"]):
+                found = _space(g, topic, args.level) if topic == "shapes" or topic in topics_for_grade(g) else None
+                print(f"grade {g}\t{topic}\t{len(found[1]) if found else '-'}")
+        return
+    for g in args.grades:
+        for topic in args.topics or ():
+            if topic != "shapes" and topic not in topics_for_grade(g):
+                print(f"warning: grade {g}: no {topic} questions at this grade, skipped", file=sys.stderr)
+    rows, shortfall = generate_sheet(args.grades, args.topics, None if args.all else args.n, args.seed, args.workers,
+                                     args.level)
+    for where, missing in shortfall.items():
+        print(f"warning: {where}: only {args.n - missing} unique questions available", file=sys.stderr)
+
+    if args.format == "pdf":
+        write_pdf(rows, args.out)
+    else:
+        out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+        try:
+            (write_csv if args.format == "csv" else write_json)(rows, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    if args.out:
+        print(f"Wrote {len(rows)} questions to {os.path.abspath(args.out)}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()